@@ -0,0 +1,148 @@
+import sys
+import json
+import time
+import platform
+import argparse
+import statistics
+import subprocess
+import polyiamond
+import exact_cover
+import dancing_links
+import bitmask_cover
+
+# Benchmarks for the whole pipeline on fixed inputs: the hexagonish grid,
+# the twelve hexiamonds and the first covers every search finds from them.
+# Nothing is read from the placement cache, and the memoized orientations
+# are cleared before each run, so every stage is timed from scratch.
+#
+#   python benchmark.py --output bench.json
+#   python benchmark.py --baseline bench.json
+#
+# Each result holds the best and median of its runs in seconds. With
+# --baseline, results are compared to an earlier --output file and the
+# exit status is 1 if any stage got slower than the tolerance allows.
+
+def timeRuns(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return {'best': min(times), 'median': statistics.median(times), 'runs': repeat}, result
+
+def clearOrientations():
+    polyiamond._orientations.clear()
+
+def countNodes(rows, primaryKeys, method, n_covers):
+    if method == 'dlx':
+        nodes = [0]
+        def visit(choices, branches):
+            nodes[0] += 1
+        found = dancing_links.search(dancing_links.makeLinks(rows, primaryKeys), visit=visit)
+    elif method == 'bitmask':
+        stats = {}
+        found = bitmask_cover.search(bitmask_cover.makeBitmaskMatrix(rows, primaryKeys), stats=stats)
+    else:
+        return None
+    for i, _ in enumerate(found):
+        if i + 1 == n_covers:
+            break
+    found.close()
+    return nodes[0] if method == 'dlx' else stats['nodes']
+
+def runBenchmarks(n_covers = 10, repeat = 5, methods = ('dlx', 'bitmask')):
+    results = {}
+
+    def bench(name, fn, runs = repeat):
+        results[name], result = timeRuns(fn, runs)
+        print('{:32} {:10.4f} s'.format(name, results[name]['best']), file=sys.stderr)
+        return result
+
+    grid = bench('makeHexagonishGrid', polyiamond.makeHexagonishGrid)
+
+    def allOrientations():
+        clearOrientations()
+        return [polyiamond.orientations(hname, path) for hname, path in polyiamond.HEXIAMONDS.items()]
+    bench('orientations', allOrientations)
+
+    def placements():
+        clearOrientations()
+        return polyiamond.getPlacements(grid, polyiamond.HEXIAMONDS)
+    hexi_p = bench('getPlacements', placements)
+
+    rows, keys = bench('makeProblemMatrix', lambda: exact_cover.makeProblemMatrix(grid['triangles'], hexi_p))
+
+    covers = None
+    for method in methods:
+        name = 'getCovers[{}]'.format(method)
+        found = bench(name, lambda: exact_cover.getCovers(rows, keys, n_covers, method), 1)
+        results[name]['covers'] = len(found)
+        nodes = countNodes(rows, keys, method, n_covers)
+        if nodes is not None:
+            results[name]['nodes'] = nodes
+            results[name]['nodesPerSecond'] = nodes / results[name]['best']
+        covers = covers or found
+
+    with_paths = bench('getPathsForPlacementsInCovers',
+                       lambda: exact_cover.getPathsForPlacementsInCovers(covers, hexi_p))
+
+    # rendering needs make_tikzpictures' own dependencies
+    try:
+        import make_tikzpictures
+    except ImportError as e:
+        results['tikzCover'] = {'skipped': str(e)}
+    else:
+        bench('tikzCover', lambda: [make_tikzpictures.tikzCover(cover, grid['perim'], 2.75, .9, 1)
+                                    for cover in with_paths])
+        results['tikzCover']['covers'] = len(with_paths)
+
+    return results
+
+def gitRevision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# compare the best times of results with those of baseline; a stage that
+# takes more than tolerance times as long is a regression
+def compareResults(results, baseline, tolerance = 1.2):
+    regressions = []
+    print('{:32} {:>10} {:>10} {:>8}'.format('benchmark', 'baseline', 'current', 'ratio'))
+    for name, result in results.items():
+        before = baseline.get(name, {})
+        if 'best' not in result or 'best' not in before:
+            print('{:32} {:>10} {:>10} {:>8}'.format(name, '-', '-', '-'))
+            continue
+        ratio = result['best'] / before['best']
+        flag = ' slower' if ratio > tolerance else ''
+        print('{:32} {:10.4f} {:10.4f} {:8.2f}{}'.format(name, before['best'], result['best'], ratio, flag))
+        if flag:
+            regressions.append(name)
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time the placement, search and rendering pipeline.')
+    parser.add_argument('--covers', type=int, default=10, help='covers each search has to find')
+    parser.add_argument('--repeat', type=int, default=5, help='runs of every stage but the searches')
+    parser.add_argument('--methods', default='dlx,bitmask', help='comma separated exact_cover search methods')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare with the results in this JSON file')
+    parser.add_argument('--tolerance', type=float, default=1.2, help='slowdown ratio counted as a regression')
+    args = parser.parse_args()
+
+    report = {'python': platform.python_version(), 'machine': platform.machine(),
+              'revision': gitRevision(), 'covers': args.covers, 'repeat': args.repeat,
+              'results': runBenchmarks(args.covers, args.repeat, args.methods.split(','))}
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('covers') != args.covers:
+            print('baseline found {} covers per search, not {}'.format(baseline.get('covers'), args.covers))
+        if compareResults(report['results'], baseline['results'], args.tolerance):
+            sys.exit(1)
@@ -0,0 +1,214 @@
+# Exact cover over a bitmask encoding of the problem matrix: every column
+# gets one bit of a Python int, so a row is a single int and a conflict test
+# is a single AND.
+#
+# Primary columns take the low bits, triangles before piece names, so the
+# lowest unset bit of the filled mask is always the next empty triangle.
+# When every lower column is already covered, a row that fits over column c
+# cannot contain a lower column, so the candidates for c are precomputed as
+# the rows whose lowest bit is c.
+#
+# Dead-region pruning: the empty triangles split into edge-connected
+# components, and no piece can reach across filled triangles, so each
+# component has to be tiled on its own. A component whose size is not a
+# multiple of the gcd of the piece sizes, or whose lowest triangle no
+# remaining row fits over, ends the branch at once instead of only when the
+# search fills its way down to it.
+
+import time
+import math
+import functools
+import polyiamond
+
+def columnOrder(key):
+    if isinstance(key, str):
+        return (1, key)
+    return (0, key)
+
+# rows and primaryKeys are as returned by exact_cover.makeProblemMatrix
+def makeBitmaskMatrix(rows, primaryKeys):
+    keys = set()
+    for row in rows.values():
+        keys.update(row)
+    primary = sorted((k for k in keys if k in primaryKeys), key=columnOrder)
+    secondary = sorted((k for k in keys if k not in primaryKeys), key=columnOrder)
+    columns = primary + secondary
+    bit = {key: i for i, key in enumerate(columns)}
+
+    masks = []
+    row_ids = []
+    candidates = [[] for _ in primary]
+    grain = 0 # gcd of the rows' triangle counts
+    for ridx, row in rows.items():
+        grain = math.gcd(grain, sum(1 for key in row if not isinstance(key, str)))
+        mask = 0
+        for key in row:
+            mask |= 1 << bit[key]
+        low = (mask & -mask).bit_length() - 1
+        if low >= len(primary): # covers no primary column, can never be chosen
+            continue
+        candidates[low].append(len(masks))
+        masks.append(mask)
+        row_ids.append(ridx)
+
+    # the primary triangle columns and, for each, those sharing an edge with it
+    triangles = 0
+    adjacent = [0]*len(primary)
+    for i, key in enumerate(primary):
+        if not isinstance(key, str):
+            triangles |= 1 << i
+            for tid in polyiamond.triangleNeighbours(key):
+                if tid in primaryKeys:
+                    adjacent[i] |= 1 << bit[tid]
+
+    # the triangles next to each row
+    halo = []
+    for mask in masks:
+        near = 0
+        rest = mask & triangles
+        while rest:
+            b = rest & -rest
+            near |= adjacent[b.bit_length() - 1]
+            rest ^= b
+        halo.append(near & ~mask)
+
+    return {'columns': columns, 'bit': bit, 'masks': masks, 'rows': row_ids,
+            'candidates': candidates, 'full': (1 << len(primary)) - 1,
+            'triangles': triangles, 'adjacent': adjacent, 'halo': halo, 'grain': max(grain, 1)}
+
+def maskOf(matrix, keys):
+    mask = 0
+    for key in keys:
+        mask |= 1 << matrix['bit'][key]
+    return mask
+
+# index of the lowest primary column not in the used mask
+def lowestFree(used):
+    return (~used & (used + 1)).bit_length() - 1
+
+# Returns dead(used, seeds = None), which tells whether some component of
+# the triangles not in the used mask can't be tiled. Only the components
+# holding a triangle of seeds are looked at, all of them by default, and a
+# component is given up on as soon as it grows past limit triangles: pockets
+# cut off by a placement are small, and measuring the rest of the region at
+# every node would cost more than the pruning saves.
+def makeDeadRegionTest(matrix, limit = None):
+    masks, candidates, adjacent, grain = matrix['masks'], matrix['candidates'], matrix['adjacent'], matrix['grain']
+    triangles = matrix['triangles']
+    if limit is None:
+        limit = triangles.bit_count()
+
+    def dead(used, seeds = None):
+        free = triangles & ~used
+        seeds = free if seeds is None else seeds & free
+        while seeds:
+            component = frontier = seeds & -seeds
+            size = 1
+            while frontier and size <= limit:
+                grown = 0
+                while frontier:
+                    b = frontier & -frontier
+                    grown |= adjacent[b.bit_length() - 1]
+                    frontier ^= b
+                frontier = grown & free & ~component
+                component |= frontier
+                size += frontier.bit_count()
+            seeds &= ~component
+            if frontier:
+                continue
+            if size % grain:
+                return True
+            low = component & -component
+            for r in candidates[low.bit_length() - 1]:
+                if not masks[r] & used:
+                    break
+            else:
+                return True
+        return False
+
+    return dead
+
+# yield each exact cover as a list of row indices, giving up once
+# time.monotonic() passes deadline. With prune, every node is first checked
+# for dead regions next to the row just placed, following components of up
+# to prune triangles (of any size for True). If stats is a dict, its 'nodes'
+# and 'pruned' entries are kept up to date with the nodes visited and the
+# ones cut by the dead region test.
+#
+# visit(fits, branches) is called on entering every node of the search tree,
+# like dancing_links.search's visit: fits[l][branches[l]] is the position in
+# matrix['masks'] of the row chosen at level l.
+def search(matrix, deadline = None, prune = False, stats = None, visit = None):
+    masks, candidates, full, row_ids = matrix['masks'], matrix['candidates'], matrix['full'], matrix['rows']
+    halo = matrix['halo']
+    if prune:
+        dead = makeDeadRegionTest(matrix, None if prune is True else prune)
+    if stats is not None:
+        stats.setdefault('nodes', 0)
+        stats.setdefault('pruned', 0)
+
+    fits = []     # rows that fit over the chosen column at each level
+    branches = [] # index into fits being tried at each level
+    used = [0]    # filled mask on entry to each level
+
+    while True:
+        if deadline is not None and time.monotonic() > deadline:
+            return
+        if visit is not None:
+            visit(fits, branches)
+        descend = False
+        if stats is not None:
+            stats['nodes'] += 1
+        if used[-1] & full == full:
+            yield [row_ids[fits[l][branches[l]]] for l in range(len(branches))]
+        elif prune and dead(used[-1], halo[fits[-1][branches[-1]]] if fits else None):
+            if stats is not None:
+                stats['pruned'] += 1
+        else:
+            u = used[-1]
+            level_fits = [r for r in candidates[lowestFree(u)] if not masks[r] & u]
+            if level_fits:
+                fits.append(level_fits)
+                branches.append(0)
+                used.append(u | masks[level_fits[0]])
+                descend = True
+
+        while not descend:
+            if len(branches) == 0:
+                return
+            l = len(branches) - 1
+            used.pop()
+            branches[l] += 1
+            if branches[l] < len(fits[l]):
+                used.append(used[-1] | masks[fits[l][branches[l]]])
+                descend = True
+            else:
+                fits.pop()
+                branches.pop()
+
+# The number of covers that complete a filled mask, memoized on the mask
+# itself: the lowest-empty-column rule makes the mask the whole state, so
+# placement orders that fill the same triangles with the same pieces share
+# one entry. The returned function is a functools.lru_cache, bounded by
+# maxsize (None for unbounded), with cache_info() and cache_clear().
+def makeCounter(matrix, maxsize = 1 << 20):
+    masks, candidates, full = matrix['masks'], matrix['candidates'], matrix['full']
+
+    @functools.lru_cache(maxsize=maxsize)
+    def count(used):
+        if used & full == full:
+            return 1
+        total = 0
+        for r in candidates[lowestFree(used)]:
+            if not masks[r] & used:
+                total += count(used | masks[r])
+        return total
+
+    return count
+
+def countCovers(matrix, maxsize = 1 << 20, used = 0):
+    count = makeCounter(matrix, maxsize)
+    total = count(used)
+    info = count.cache_info()
+    return {'count': total, 'hits': info.hits, 'misses': info.misses,
+            'maxsize': info.maxsize, 'currsize': info.currsize}
@@ -0,0 +1,89 @@
+import os
+import json
+import time
+import hashlib
+import dancing_links
+
+# Checkpointed enumeration of every exact cover with dancing links.
+#
+# Covers are appended to a text file, one per line as space separated row
+# indices, as soon as they are found. Every interval seconds the position of
+# the search (the row index and branch index chosen at each depth) is written
+# to a JSON checkpoint together with the length of the covers file at that
+# moment. The checkpoint is taken on entering a node, when exactly the covers
+# before that node have been written, so resuming truncates the covers file
+# back to the recorded length and restarts the search at the recorded node:
+# nothing is duplicated and nothing is missed.
+
+def problemHash(rows, primaryKeys):
+    h = hashlib.sha256()
+    h.update(repr(list(rows.items())).encode())
+    h.update(repr(sorted(map(repr, primaryKeys))).encode())
+    return h.hexdigest()
+
+def writeCheckpoint(checkpoint_path, checkpoint):
+    tmp = checkpoint_path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, checkpoint_path)
+
+def readCheckpoint(checkpoint_path):
+    with open(checkpoint_path, 'r') as f:
+        return json.load(f)
+
+# Enumerate every cover into solutions_path and return the total number of
+# covers in it. With resume, carry on from checkpoint_path if it exists.
+# visit is passed on to dancing_links.search, e.g. tree_estimate.makeETA.
+def enumerateWithCheckpoints(rows, primaryKeys, checkpoint_path, solutions_path,
+                             interval = 60, resume = False, visit = None):
+    problem = problemHash(rows, primaryKeys)
+    start = []
+    count = 0
+    offset = 0
+    if resume and os.path.exists(checkpoint_path):
+        checkpoint = readCheckpoint(checkpoint_path)
+        assert checkpoint['problem'] == problem, "checkpoint is for a different problem"
+        if checkpoint['done']:
+            return checkpoint['count']
+        start = [tuple(level) for level in checkpoint['position']]
+        count = checkpoint['count']
+        offset = checkpoint['offset']
+
+    links = dancing_links.makeLinks(rows, primaryKeys)
+
+    with open(solutions_path, 'a+b') as out:
+        out.truncate(offset)
+        out.seek(offset)
+
+        last = time.monotonic()
+        nodes = 0
+
+        def save(position, done):
+            out.flush()
+            os.fsync(out.fileno())
+            writeCheckpoint(checkpoint_path, {'problem': problem, 'position': position,
+                                              'count': count, 'offset': out.tell(), 'done': done})
+
+        def visitNode(choices, branches):
+            nonlocal last, nodes
+            if visit is not None:
+                visit(choices, branches)
+            nodes += 1
+            if nodes % 1024 == 0 and time.monotonic() - last >= interval:
+                save(dancing_links.position(links, choices, branches), False)
+                last = time.monotonic()
+
+        for cover in dancing_links.search(links, resume=start, visit=visitNode):
+            out.write((' '.join(map(str, cover)) + '\n').encode())
+            count += 1
+
+        save([], True)
+    return count
+
+# yield the covers in a solutions file as lists of row indices
+def readSolutions(solutions_path):
+    with open(solutions_path, 'r') as f:
+        for line in f:
+            yield [int(ridx) for ridx in line.split()]
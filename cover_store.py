@@ -0,0 +1,195 @@
+import os
+import sys
+import json
+import mmap
+import array
+import hashlib
+import polyiamond
+
+# A compact, append-only file of covers.
+#
+# Every placement gets an id, its row index in exact_cover.makeProblemMatrix
+# (placements numbered piece by piece in the order of getPlacements), and a
+# cover is stored as the sorted ids of its rows: one uint16 per piece, so
+# 38 bytes for the 19 one-sided hexiamonds, padded with NO_PLACEMENT when a
+# cover leaves a secondary piece out. That leaves ids up to 0xfffe, so a
+# problem with more placements can't be stored.
+#
+# The file starts with MAGIC, the length of a JSON header and the header,
+# which holds the pieces' paths, the names and placement counts of
+# getPlacements and the SHA-256 of the placement table. The table follows
+# as int16 triples (orientation, da, db): placement i is orientation
+# number orientation of its piece, from polyiamond.orientations, moved by
+# (da, db). Readers rebuild the placements from it and check them against
+# the hash, so a store can't silently be read with a different table.
+# The covers come last and run to the end of the file; a record cut short
+# by a crash is ignored.
+
+MAGIC = b'HXS1'
+VERSION = 1
+NO_PLACEMENT = 0xffff
+
+def tableHash(names, placements):
+    h = hashlib.sha256()
+    for name, (path, tris) in zip(names, placements):
+        h.update(repr((name, sorted(tris))).encode())
+    return h.hexdigest()
+
+def baseName(name, pieces):
+    if name not in pieces and name.endswith('-mirrored'):
+        return name[:-len('-mirrored')], 'mirrors'
+    return name, 'rotations'
+
+# the (orientation, da, db) triples and the table hash for the placements
+# getPlacements(grid, pieces) returned as hexi_p
+def makeTable(pieces, hexi_p):
+    records = array.array('h')
+    names = []
+    placements = []
+    for name, name_placements in hexi_p.items():
+        base, kind = baseName(name, pieces)
+        oris = polyiamond.orientations(base, pieces[base])[kind]
+        index = {frozenset(tris): k for k, (_, tris) in enumerate(oris)}
+        for path, tris in name_placements:
+            k = index[frozenset(polyiamond.normalizeTriangles(tris, path))]
+            da, db = path[0][0] - oris[k][0][0][0], path[0][1] - oris[k][0][0][1]
+            records.extend((k, da, db))
+            names.append(name)
+            placements.append((path, tris))
+    return records, tableHash(names, placements)
+
+# the placements of the table as (name, path, triangles), in id order
+def readTable(header, records):
+    pieces = header['pieces']
+    placements = []
+    i = 0
+    for name, count in zip(header['names'], header['counts']):
+        base, kind = baseName(name, pieces)
+        oris = polyiamond.orientations(base, [tuple(p) for p in pieces[base]])[kind]
+        for _ in range(count):
+            k, da, db = records[i:i+3]
+            i += 3
+            path, tris = oris[k]
+            offset = polyiamond.translationOffset(da, db)
+            placements.append((name, [(a+da, b+db) for a, b in path], {tid + offset for tid in tris}))
+    return placements
+
+def readHeader(f):
+    if f.read(4) != MAGIC:
+        raise ValueError("not a cover store")
+    n = int.from_bytes(f.read(4), 'little')
+    header = json.loads(f.read(n))
+    if header['version'] != VERSION:
+        raise ValueError("cover store version {} is not supported".format(header['version']))
+    records = array.array('h')
+    records.frombytes(f.read(6 * header['placements']))
+    if sys.byteorder != 'little':
+        records.byteswap()
+    return header, records, 8 + n + 6 * header['placements']
+
+# Create fname for covers of the problem built from getPlacements(grid,
+# pieces) = hexi_p, or check that an existing store is for the same
+# placements. Returns the store's header.
+def createStore(fname, pieces, hexi_p):
+    records, digest = makeTable(pieces, hexi_p)
+    if len(records) // 3 > NO_PLACEMENT:
+        raise ValueError("{} placements don't fit the uint16 ids of a cover store, at most {}".format(
+            len(records) // 3, NO_PLACEMENT))
+    if os.path.exists(fname):
+        with open(fname, 'rb') as f:
+            header = readHeader(f)[0]
+        if header['table'] != digest:
+            raise ValueError("{} holds covers of different placements".format(fname))
+        return header
+
+    header = {'version': VERSION, 'pieces': {name: list(map(list, path)) for name, path in pieces.items()},
+              'names': list(hexi_p), 'counts': [len(p) for p in hexi_p.values()],
+              'placements': len(records) // 3, 'width': len(hexi_p), 'table': digest}
+    encoded = json.dumps(header).encode()
+    encoded += b' ' * (len(encoded) % 2) # keep the uint16 records aligned
+    if sys.byteorder != 'little':
+        records.byteswap()
+    tmp = fname + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC)
+        f.write(len(encoded).to_bytes(4, 'little'))
+        f.write(encoded)
+        records.tofile(f)
+    os.replace(tmp, fname)
+    return header
+
+# Append covers, lists of row indices of makeProblemMatrix, to the store as
+# they come and return how many were written. Each is flushed before the
+# next is taken, so a solver can stream straight into the store.
+def appendCovers(fname, covers):
+    with open(fname, 'rb') as f:
+        header, _, start = readHeader(f)
+    width = header['width']
+    record_size = 2 * width
+    count = 0
+    with open(fname, 'r+b') as f:
+        # drop a record a crash left unfinished
+        size = f.seek(0, os.SEEK_END)
+        f.truncate(size - (size - start) % record_size)
+        f.seek(0, os.SEEK_END)
+        for cover in covers:
+            ids = sorted(cover)
+            assert len(ids) <= width, "cover has more rows than pieces"
+            record = array.array('H', ids + [NO_PLACEMENT] * (width - len(ids)))
+            if sys.byteorder != 'little':
+                record.byteswap()
+            f.write(record.tobytes())
+            f.flush()
+            count += 1
+    return count
+
+# Open a store for reading. The covers are memory-mapped, not read, so
+# readCover(store, i) for any i only touches that cover's bytes.
+def openStore(fname):
+    with open(fname, 'rb') as f:
+        header, records, start = readHeader(f)
+        size = os.fstat(f.fileno()).st_size
+        record_size = 2 * header['width']
+        count = (size - start) // record_size
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if count else None
+
+    placements = readTable(header, records)
+    if tableHash([name for name, _, _ in placements], [(path, tris) for _, path, tris in placements]) != header['table']:
+        raise ValueError("{} was written with placements this code no longer makes".format(fname))
+
+    ids = memoryview(mm)[start:start + count * record_size].cast('H') if count else memoryview(b'').cast('H')
+    return {'header': header, 'placements': placements, 'count': count, 'mmap': mm, 'ids': ids}
+
+def closeStore(store):
+    store['ids'].release()
+    if store['mmap'] is not None:
+        store['mmap'].close()
+
+def coverCount(store):
+    return store['count']
+
+# the placement ids of cover i, as stored
+def coverIds(store, i):
+    count, width = store['count'], store['header']['width']
+    if i < 0:
+        i += count
+    if not 0 <= i < count:
+        raise IndexError("cover {} is not in the store".format(i))
+    ids = store['ids'][i * width:(i + 1) * width].tolist()
+    if sys.byteorder != 'little':
+        ids = [((v & 0xff) << 8) | (v >> 8) for v in ids]
+    return [v for v in ids if v != NO_PLACEMENT]
+
+# cover i in the form of exact_cover.iterPathsForPlacementsInCovers:
+# {polyname: (path, triangles)}
+def readCover(store, i):
+    placements = store['placements']
+    cover = {}
+    for pid in coverIds(store, i):
+        name, path, tris = placements[pid]
+        cover[name] = (path, tris)
+    return cover
+
+def iterStore(store, start = 0, stop = None):
+    for i in range(start, store['count'] if stop is None else min(stop, store['count'])):
+        yield readCover(store, i)
@@ -0,0 +1,263 @@
+# Algorithm X with dancing links, as described by Knuth in
+# https://arxiv.org/abs/cs/0011047
+#
+# The nodes live in flat integer lists rather than objects. Node 0 is the
+# root, nodes 1..len(names) are the column headers and the remaining nodes
+# are the 1s of the matrix, one per (row, key) pair. Covering and
+# uncovering a column only rewrites links, so a search node costs time
+# proportional to the rows it actually removes instead of copying the matrix.
+
+import time
+
+# rows and primaryKeys are as returned by exact_cover.makeProblemMatrix.
+# Keys that are not primary become secondary columns: they are never chosen
+# for branching, but still may be covered at most once.
+def makeLinks(rows, primaryKeys):
+    names = []
+    column = {}
+    for row in rows.values():
+        for key in row:
+            if key not in column:
+                column[key] = len(names) + 1
+                names.append(key)
+
+    n = len(names) + 1
+    L = [0]*n
+    R = [0]*n
+    U = list(range(n))
+    D = list(range(n))
+    C = list(range(n))
+    S = [0]*n
+    row_of = [-1]*n
+
+    # link primary headers into the root's ring, leave secondary ones alone
+    prev = 0
+    for c in range(1, n):
+        if names[c-1] in primaryKeys:
+            L[c], R[prev] = prev, c
+            prev = c
+        else:
+            L[c] = R[c] = c
+    L[0], R[prev] = prev, 0
+
+    first_node = {}
+    for ridx, row in rows.items():
+        first = None
+        for key in row:
+            c = column[key]
+            node = len(L)
+            C.append(c)
+            row_of.append(ridx)
+            U.append(U[c])
+            D.append(c)
+            D[U[c]] = node
+            U[c] = node
+            S[c] += 1
+            if first is None:
+                first = node
+                L.append(node)
+                R.append(node)
+            else:
+                L.append(L[first])
+                R.append(first)
+                R[L[first]] = node
+                L[first] = node
+        if first is not None:
+            first_node[ridx] = first
+
+    return {'L': L, 'R': R, 'U': U, 'D': D, 'C': C, 'S': S,
+            'row': row_of, 'names': names, 'columns': column, 'first': first_node}
+
+def cover(links, c):
+    L, R, U, D, C, S = links['L'], links['R'], links['U'], links['D'], links['C'], links['S']
+    L[R[c]] = L[c]
+    R[L[c]] = R[c]
+    i = D[c]
+    while i != c:
+        j = R[i]
+        while j != i:
+            U[D[j]] = U[j]
+            D[U[j]] = D[j]
+            S[C[j]] -= 1
+            j = R[j]
+        i = D[i]
+
+def uncover(links, c):
+    L, R, U, D, C, S = links['L'], links['R'], links['U'], links['D'], links['C'], links['S']
+    i = U[c]
+    while i != c:
+        j = L[i]
+        while j != i:
+            S[C[j]] += 1
+            U[D[j]] = j
+            D[U[j]] = j
+            j = L[j]
+        i = U[i]
+    L[R[c]] = c
+    R[L[c]] = c
+
+# cover the other columns of the row containing node r
+# (its own column is covered by the caller)
+def selectNode(links, r):
+    R, C = links['R'], links['C']
+    j = R[r]
+    while j != r:
+        cover(links, C[j])
+        j = R[j]
+
+def unselectNode(links, r):
+    L, C = links['L'], links['C']
+    j = L[r]
+    while j != r:
+        uncover(links, C[j])
+        j = L[j]
+
+# choose the primary column with the fewest rows. Ties go to the last such
+# column so the branching order matches exact_cover.getCovers' chooseKey,
+# or, given a random.Random as rng, to one of them picked at random.
+def chooseColumn(links, rng = None):
+    R, S = links['R'], links['S']
+    best = None
+    ties = 0
+    c = R[0]
+    while c != 0:
+        if best is None or S[c] < S[best]:
+            best = c
+            ties = 1
+        elif S[c] == S[best]:
+            ties += 1
+            if rng is None or rng.randrange(ties) == 0:
+                best = c
+        c = R[c]
+    return best
+
+# yield each exact cover as a list of row indices. The search gives up once
+# time.monotonic() passes deadline. However it ends, even when the caller
+# closes it early, the links are restored to the state it started from.
+#
+# visit(choices, branches) is called on entering every node of the search
+# tree; choices[l][branches[l]] is the node chosen at level l (see position).
+# resume is a position from an earlier search of the same links: the search
+# starts at that node and carries on from there, as if everything before it
+# had already been visited. If visit returns a true value, the search stops
+# there.
+#
+# With a random.Random as rng, ties between columns are broken at random and
+# the candidate rows of each column are tried in a random order, so the
+# covers come from a different part of the tree for every seed (resume is
+# then meaningless).
+def search(links, deadline = None, resume = None, visit = None, rng = None):
+    R, D, C, row_of = links['R'], links['D'], links['C'], links['row']
+
+    columns = []  # column covered at each level
+    choices = []  # candidate nodes for that column
+    branches = [] # index into choices being tried at each level
+
+    try:
+        for ridx, branch in resume or ():
+            c = chooseColumn(links)
+            assert c is not None, "resume position is deeper than the search tree"
+            nodes = []
+            i = D[c]
+            while i != c:
+                nodes.append(i)
+                i = D[i]
+            assert branch < len(nodes) and row_of[nodes[branch]] == ridx, "resume position does not match the links"
+            cover(links, c)
+            columns.append(c)
+            choices.append(nodes)
+            branches.append(branch)
+            selectNode(links, nodes[branch])
+
+        while True:
+            if deadline is not None and time.monotonic() > deadline:
+                return
+            if visit is not None and visit(choices, branches):
+                return
+            descend = False
+            if R[0] == 0:
+                yield [row_of[choices[l][branches[l]]] for l in range(len(columns))]
+            else:
+                c = chooseColumn(links, rng)
+                if links['S'][c] > 0:
+                    cover(links, c)
+                    nodes = []
+                    i = D[c]
+                    while i != c:
+                        nodes.append(i)
+                        i = D[i]
+                    if rng is not None:
+                        rng.shuffle(nodes)
+                    columns.append(c)
+                    choices.append(nodes)
+                    branches.append(0)
+                    selectNode(links, nodes[0])
+                    descend = True
+
+            # backtrack to the deepest level with an untried candidate
+            while not descend:
+                if len(columns) == 0:
+                    return
+                l = len(columns) - 1
+                unselectNode(links, choices[l][branches[l]])
+                branches[l] += 1
+                if branches[l] < len(choices[l]):
+                    selectNode(links, choices[l][branches[l]])
+                    descend = True
+                else:
+                    uncover(links, columns.pop())
+                    choices.pop()
+                    branches.pop()
+    finally:
+        while columns:
+            l = len(columns) - 1
+            unselectNode(links, choices[l][branches[l]])
+            uncover(links, columns.pop())
+            choices.pop()
+            branches.pop()
+
+# the path from the root to the node search is at, as (row index, branch
+# index) pairs, one per level
+def position(links, choices, branches):
+    row_of = links['row']
+    return [(row_of[choices[l][branches[l]]], branches[l]) for l in range(len(branches))]
+
+# cover every column of row ridx, as if the search had chosen it.
+# The row must not conflict with any row selected before it.
+def selectRow(links, ridx):
+    r = links['first'][ridx]
+    cover(links, links['C'][r])
+    selectNode(links, r)
+
+# undo selectRow; rows must be unselected in the reverse order
+def unselectRow(links, ridx):
+    r = links['first'][ridx]
+    unselectNode(links, r)
+    uncover(links, links['C'][r])
+
+# the search tree cut off at depth: a list of the row index paths that
+# reach it, in the order search visits them. Paths to covers found above
+# that depth are included as they are.
+def expandPrefixes(links, depth):
+    R, D, row_of = links['R'], links['D'], links['row']
+    prefixes = []
+    path = []
+
+    def expand():
+        if R[0] == 0 or len(path) == depth:
+            prefixes.append(path.copy())
+            return
+        c = chooseColumn(links)
+        cover(links, c)
+        i = D[c]
+        while i != c:
+            path.append(row_of[i])
+            selectNode(links, i)
+            expand()
+            unselectNode(links, i)
+            path.pop()
+            i = D[i]
+        uncover(links, c)
+
+    expand()
+    return prefixes
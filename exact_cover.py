@@ -1,5 +1,15 @@
 import polyiamond
+import placement_cache
+import dancing_links
+import bitmask_cover
+import parallel_covers
+import checkpoint
+import cover_store
+import os
 import pickle
+import itertools
+import time
+import argparse
 
 def makeProblemMatrix(grid, poly_placements):
     rows = {}
@@ -21,7 +31,47 @@ def makeProblemMatrix(grid, poly_placements):
             
     return rows, keys
 
-def getCovers(rows, primaryKeys, maxSolutions = 100):
+# Yield each cover, in the form described at translateCovers, as soon as it
+# is found. method is 'x' for the dict-copying search below, 'dlx' for
+# dancing links, 'bitmask' for the bitset search or 'parallel' for dancing
+# links spread over a process pool. The search stops after limit covers,
+# once timeout seconds have passed, or when the caller closes the generator.
+# Covers are never collected, so memory stays flat however many there are.
+def iterCovers(rows, primaryKeys, limit = None, timeout = None, method = 'dlx'):
+    if limit is not None and limit <= 0:
+        return
+    deadline = None if timeout is None else time.monotonic() + timeout
+    found = searchRows(rows, primaryKeys, method, deadline)
+    try:
+        count = 0
+        for solution in found:
+            if deadline is not None and time.monotonic() > deadline:
+                return
+            yield translateCover(solution, rows)
+            count += 1
+            if limit is not None and count >= limit:
+                return
+    finally:
+        found.close()
+
+# the untranslated covers, as lists of row indices, from the chosen search
+def searchRows(rows, primaryKeys, method = 'dlx', deadline = None):
+    if method == 'x':
+        return algorithmX(rows, primaryKeys, deadline)
+    elif method == 'dlx':
+        return dancing_links.search(dancing_links.makeLinks(rows, primaryKeys), deadline)
+    elif method == 'bitmask':
+        return bitmask_cover.search(bitmask_cover.makeBitmaskMatrix(rows, primaryKeys), deadline)
+    elif method == 'parallel':
+        return parallel_covers.parallelSearch(rows, primaryKeys, deadline=deadline)
+    raise ValueError("unknown method {}".format(method))
+
+# With maxSolutions = None every cover is returned
+def getCovers(rows, primaryKeys, maxSolutions = 100, method = 'x'):
+    return list(iterCovers(rows, primaryKeys, limit = maxSolutions, method = method))
+
+# yield each exact cover as a list of row indices
+def algorithmX(rows, primaryKeys, deadline = None):
     pkCounts = {}
     for row in rows.values():
         for key in row:
@@ -35,18 +85,16 @@ def getCovers(rows, primaryKeys, maxSolutions = 100):
     def chooseKey(counts): #choose key with minimum rows
         return {v:k for k,v in counts.items()}[min(counts.values())]
     
-    solutions = [] #list of lists of row indices
-
     # Algorithm X 
-    # Not implemented with dancing links. This is just meant to find a few, not all exact covers
+    # Not implemented with dancing links (see dancing_links.py for that).
+    # This is just meant to find a few, not all exact covers
     def search(curr_sol, curr_rows, curr_kcounts, curr_filled_baseshapes):
         if len(curr_kcounts) == 0:
-            print('SOLUTION FOUND')
-            solutions.append(curr_sol)
+            yield curr_sol
             return
 
-        if len(solutions) >= maxSolutions:
-            raise Exception ('Stopped finding solutions')
+        if deadline is not None and time.monotonic() > deadline:
+            return
         
         coverKey = chooseKey(curr_kcounts)
         
@@ -95,60 +143,75 @@ def getCovers(rows, primaryKeys, maxSolutions = 100):
                 assert next_kcounts[key] == 0
                 del next_kcounts[key]
                     
-            search(next_sol, next_rows, next_kcounts, next_filled_baseshapes)
+            yield from search(next_sol, next_rows, next_kcounts, next_filled_baseshapes)
 
-    try:
-        search([], rows, pkCounts, {})
-    except Exception as message:
-        return translateCovers(solutions, rows)
+    yield from search([], rows, pkCounts, {})
 
 # The incoming covers are lists of row indices from the problem matrix.
 # The outgoing covers are lists of dictionaries with polyform names
 # as keys and occupied base shapes as values
 def translateCovers(covers_in, matrix):
-    covers_out = []
-    for cover_in in covers_in:
-        cover_out = {}
-        rows = [matrix[ridx] for ridx in cover_in]
-        for row in rows:
-            polyname = None
-            base_shapes = []
-            for key in row:
-                if type(key) is not str:
-                    base_shapes.append(key)
-                else:
-                    assert polyname is None, "..."
-                    polyname = key
-            cover_out[polyname] = base_shapes
-        covers_out.append(cover_out)
-    return covers_out
+    return [translateCover(cover_in, matrix) for cover_in in covers_in]
+
+def translateCover(cover_in, matrix):
+    cover_out = {}
+    rows = [matrix[ridx] for ridx in cover_in]
+    for row in rows:
+        polyname = None
+        base_shapes = []
+        for key in row:
+            if type(key) is not str:
+                base_shapes.append(key)
+            else:
+                assert polyname is None, "..."
+                polyname = key
+        cover_out[polyname] = base_shapes
+    return cover_out
 
 def getPathsForPlacementsInCovers(covers, poly_placements):
+    return list(iterPathsForPlacementsInCovers(covers, poly_placements))
 
-    new_covers = []
-    
-    def getPath(polyname, triangles):
-        triangles = frozenset(triangles)
-        placements = poly_placements[polyname]
-        placement_tris = list(map(lambda x: x[1], placements))
-        assert triangles in placement_tris
+def iterPathsForPlacementsInCovers(covers, poly_placements):
+    paths = {}
+    for polyname, placements in poly_placements.items():
         for path, tris in placements:
-            if tris == triangles:
-                return path
-        assert False, "Should never get here"
-        
+            paths[(polyname, frozenset(tris))] = path
+
     for cover in covers:
-        new_cover = {polyname : [] for polyname in cover}
+        new_cover = {}
         for polyname, triangles in cover.items():
-            path = getPath(polyname, triangles)
-            new_cover[polyname] = (path, triangles)
-        new_covers.append(new_cover)
-    return new_covers
-            
+            key = (polyname, frozenset(triangles))
+            assert key in paths, "{} placement not found".format(polyname)
+            new_cover[polyname] = (paths[key], triangles)
+        yield new_cover
+
+# Read the covers of an old .pkl file, pickled one at a time or as a whole
+# list; new covers go to a cover_store instead
+def loadCovers(f):
+    while True:
+        try:
+            obj = pickle.load(f)
+        except EOFError:
+            return
+        if isinstance(obj, list): # a whole list pickled at once
+            yield from obj
+        else:
+            yield obj
 
 if __name__ == '__main__':
-    grid = polyiamond.makeHexagonishGrid()
-    hexi_p = polyiamond.getPlacements(grid, polyiamond.HEXIAMONDS)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--checkpoint', help='enumerate every cover, checkpointing the search to this file')
+    parser.add_argument('--solutions', default='covers.txt', help='file the covers are appended to with --checkpoint')
+    parser.add_argument('--interval', type=float, default=60, help='seconds between checkpoints')
+    parser.add_argument('--resume', action='store_true', help='continue from the last checkpoint')
+    # not a-few-covers.hxs: that holds the covers the README's pictures are
+    # drawn from, which the solver no longer finds first
+    parser.add_argument('--output', default='covers.hxs', help='cover store the first covers are written to')
+    parser.add_argument('--count', type=int, default=100, help='number of covers to write')
+    args = parser.parse_args()
+
+    grid = placement_cache.cachedHexagonishGrid()
+    hexi_p = placement_cache.cachedPlacements(grid, polyiamond.HEXIAMONDS)
     matrix, primaryKeys = makeProblemMatrix(grid['triangles'], hexi_p)
 
     print('len(hexi_p):', len(hexi_p))
@@ -157,9 +220,14 @@ if __name__ == '__main__':
     print('len(primaryKeys):', len(primaryKeys))
     print('len(matrix[0]):', len(matrix[0]))
 
-    covers = getCovers(matrix, primaryKeys)
-
-    new_covers = getPathsForPlacementsInCovers(covers, hexi_p)
-
-    with open('a-few-covers.pkl', 'wb') as f:
-        pickle.dump(new_covers, f)
+    if args.checkpoint:
+        total = checkpoint.enumerateWithCheckpoints(matrix, primaryKeys, args.checkpoint, args.solutions,
+                                                    args.interval, args.resume)
+        print('covers:', total)
+    else:
+        if os.path.exists(args.output):
+            os.remove(args.output)
+        cover_store.createStore(args.output, polyiamond.HEXIAMONDS, hexi_p)
+        found = searchRows(matrix, primaryKeys)
+        cover_store.appendCovers(args.output, itertools.islice(found, args.count))
+        found.close()
@@ -1,36 +1,15 @@
 import os
-import math
+import hashlib
+import concurrent.futures
 import polyiamond
+import placement_cache
+import cover_store
+from polyiamond import eisToCar, rotate30
 import re
-import pickle
 import pymupdf
 import sys
 import subprocess
 
-def eisToCar(eisInt):
-    a, b = eisInt
-    bwRe = -b/2
-    bwIm = b*math.sqrt(3)/2
-    x = a + bwRe
-    y = bwIm
-    return (x, y)
-
-# p is a cartesian point
-def rotate30(p):
-    ''' (1, 0) -> (sqrt(3)/2, 1/2)
-        (0, 1) -> (-1/2, sqrt(3)/2)
-    \\begin{pmatrix}
-    sqrt(3)/2 & -1/2 \\
-    1/2       & sqrt(3)/2
-    \\end{pmatrix}
-    '''
-    x, y = p
-    sqrt3o2 = math.sqrt(3)/2
-    rot_x = x*sqrt3o2 + y*-0.5
-    rot_y = x*0.5 + y*sqrt3o2
-    return rot_x, rot_y
-    
-
 def tikzPath(eisen_path: list[tuple[int]], rotate=True):
     length = len(eisen_path)
     path = ''
@@ -85,8 +64,8 @@ def tikzGrid(eisen_path, points, triangles, lattice = True, draw_points = False)
             x, y = eisToCar(p)
             commands += '\\filldraw ({},{}) circle ({});\n'.format(x, y, point_size)
     if lattice:
-        for tri in triangles:
-            commands += '\\draw {};\n'.format(tikzPath(tri))
+        for tri in sorted(triangles): # a stable order keeps the .tex, and its hash, the same
+            commands += '\\draw {};\n'.format(tikzPath(polyiamond.triangleCorners(tri)))
     return commands    
 
 def pdfGrid(no_extension_fname: str, eisen_path, points, triangles):
@@ -96,24 +75,25 @@ def pdfGrid(no_extension_fname: str, eisen_path, points, triangles):
     makePDF(body, no_extension_fname)
 
 def pdfPlacements(no_extension_fname: str, hnames):
-    grid = polyiamond.makeHexagonishGrid()
+    grid = placement_cache.cachedHexagonishGrid()
     grid_path, interior_points, grid_triangles = grid['perim'], grid['points'], grid['triangles']
 
     tikz_grid = tikzGrid(grid_path, interior_points, grid_triangles)
     
-    hexi_p = polyiamond.getPlacements(grid, polyiamond.HEXIAMONDS)
-    body = ''
+    hexi_p = placement_cache.cachedPlacements(grid, polyiamond.HEXIAMONDS)
+    pages = []
     for hname, placements in hexi_p.items():
         if hname not in hnames:
             continue
         for placement in placements:
-            body += '\\[\n\\begin{tikzpicture}\n'
-            body += tikz_grid            
+            page = '\\[\n\\begin{tikzpicture}\n'
+            page += tikz_grid            
             path = tikzPath(placement[0])
-            body += '\\filldraw[color = {}] {};\n'.format(hname, path)
-            body += '\\draw[line width = 3pt] {};\n'.format(path)            
-            body += '\\end{tikzpicture}\n\\]\n\\pagebreak\n\n'
-    makePDF(body, 'placements/{}'.format(no_extension_fname), doc_class = 'article')
+            page += '\\filldraw[color = {}] {};\n'.format(hname, path)
+            page += '\\draw[line width = 3pt] {};\n'.format(path)            
+            page += '\\end{tikzpicture}\n\\]\n\\pagebreak\n\n'
+            pages.append(page)
+    buildPDF(pages, 'placements/{}'.format(no_extension_fname), doc_class = 'article')
 
 def pdfHexiamondNames(no_extension_fname: str):
     body = '\\begin{minipage}{30pc}\n'
@@ -163,7 +143,7 @@ def tikzCover(cover, grid_path, blt, wlt, rness):
     return picture
 
 def pdfCovers(no_extension_fname, covers, doc_class = 'article'):
-    grid = polyiamond.makeHexagonishGrid()
+    grid = placement_cache.cachedHexagonishGrid()
     grid_path = grid['perim']
 
     blt = 2.75 # black line thickness
@@ -176,73 +156,129 @@ def pdfCovers(no_extension_fname, covers, doc_class = 'article'):
     topsep = '5ex'
     bottomsep = '5ex'
     
-    body = ''
-    if not is_article:
-        body += '\\begin{minipage}'
-        body += '{{{}}}\n'.format(minipage_width)
-        body += '\\begin{figure}\\centering'
-        body += '\\vspace{{{}}}\n\n'.format(topsep)
+    if is_article:
+        pages = ['\\[\n' + tikzCover(cover, grid_path, blt, wlt, rness) + '\\]\n\n\\pagebreak\n\n'
+                 for cover in covers]
+        buildPDF(pages, no_extension_fname, doc_class)
+        return
+
+    body = '\\begin{minipage}'
+    body += '{{{}}}\n'.format(minipage_width)
+    body += '\\begin{figure}\\centering'
+    body += '\\vspace{{{}}}\n\n'.format(topsep)
         
     for cover in covers:
-        if is_article:
-            body += '\\[\n'
-            
         body += tikzCover(cover, grid_path, blt, wlt, rness)
-        
-        if is_article:
-            body += '\\]\n\n\\pagebreak\n\n'
             
-    if not is_article:
-        body += '\n\\vspace{{{}}}\n\n'.format(bottomsep)
-        body += '\\end{figure}\\end{minipage}\n'        
+    body += '\n\\vspace{{{}}}\n\n'.format(bottomsep)
+    body += '\\end{figure}\\end{minipage}\n'        
         
     makePDF(body, no_extension_fname, doc_class)
     
 
-def makePDF(body: str, no_extension_fname: str, doc_class = 'article'):
-    cwd = os.getcwd()
-    
-    os.chdir('pictures/')
+HERE = os.path.dirname(os.path.abspath(__file__))
+PICTURES_DIR = os.path.join(HERE, 'pictures')
+BUILD_DIR = os.path.join(PICTURES_DIR, '.build')
 
-    dirname = os.path.dirname(no_extension_fname)
+def texDocument(body: str, doc_class = 'article'):
+    return ('\\documentclass{{{cls}}}\n'.format(cls=doc_class)
+            + getTeXpreamble(os.path.join(HERE, 'preamble-tikz.tex'))
+            + '\\begin{document}' + body + '\\end{document}')
 
-    if dirname != '':
-        os.chdir(dirname)
+# run pdflatex on tex_path in its own directory, without touching this
+# process' working directory, and return its output. A failed run deletes
+# whatever .pdf it left, so only a .pdf from a run that succeeded is ever
+# taken as up to date.
+def runPdflatex(tex_path: str):
+    directory, tex_file = os.path.split(tex_path)
+    print('Running pdflatex {}'.format(tex_file))
+    result = subprocess.run(['pdflatex', '-interaction=nonstopmode', tex_file], cwd=directory,
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    if result.returncode != 0:
+        print("\n! pdflatex failed on {}".format(tex_file))
+        print("".join(result.stdout.splitlines(keepends=True)[-15:]))
+        pdf_path = tex_path[:-len('.tex')] + '.pdf'
+        if os.path.exists(pdf_path):
+            os.remove(pdf_path)
+    return result.stdout
 
-    basename = os.path.basename(no_extension_fname)
-    
-    tex_file = '{}.tex'.format(basename)
-    
-    with open(tex_file, 'w') as f:
-        f.write('\\documentclass{{{cls}}}\n'.format(cls=doc_class))
-        f.write(getTeXpreamble('{}/preamble-tikz.tex'.format(cwd)))
-        f.write('\\begin{document}')
-        f.write(body)
-        f.write('\\end{document}')
+def writeLog(outputs):
+    script_name = re.search('[^.]+', os.path.basename(sys.argv[0])).group(0)
+    with open(os.path.join(HERE, 'log_{}.txt'.format(script_name)), 'w') as f:
+        f.write(''.join(outputs))
 
-    script_name = re.search('[^.]+', sys.argv[0]).group(0)
+# Write pictures/<no_extension_fname>.tex and run pdflatex on it, unless the
+# .tex already there has the same content and its .pdf exists. Standalone
+# documents are also rendered to a .png.
+def makePDF(body: str, no_extension_fname: str, doc_class = 'article'):
+    base = os.path.join(PICTURES_DIR, no_extension_fname)
+    tex = texDocument(body, doc_class)
+    tex_path, pdf_path = base + '.tex', base + '.pdf'
 
-    log_fname = '{}/log_{}.txt'.format(cwd,script_name)
-    print('Running pdflatex {}'.format(tex_file))
-    try: 
-        with open(log_fname, 'w') as f:
-            subprocess.run(['pdflatex', '-interaction=nonstopmode', tex_file], stdout=f, stderr=subprocess.STDOUT, check=True)
-    except subprocess.CalledProcessError as e:
-        print("\n! pdflatex failed")
-        with open(log_fname, 'r') as f:
-            print("".join(f.readlines()[-15:]))
-
-    if doc_class == 'standalone':
-        pdf = pymupdf.open('{}.pdf'.format(basename))
+    if os.path.exists(tex_path) and os.path.exists(pdf_path):
+        with open(tex_path, 'r') as f:
+            if f.read() == tex:
+                print('{} is up to date'.format(os.path.basename(pdf_path)))
+                return
+
+    with open(tex_path, 'w') as f:
+        f.write(tex)
+    writeLog([runPdflatex(tex_path)])
+
+    if doc_class == 'standalone' and os.path.exists(pdf_path):
+        pdf = pymupdf.open(pdf_path)
         page = pdf[0]
         image = page.get_pixmap(dpi=1080)
-        fname = '{}.png'.format(basename)
-        image.save(fname, 'png', jpg_quality=100)
+        image.save(base + '.png', 'png', jpg_quality=100)
+
+# Build a many-page article as pictures/<no_extension_fname>.pdf: the pages
+# are split into chunks of chunk_pages, each chunk is its own document under
+# pictures/.build/, up to workers pdflatex runs go at once, and the chunk
+# PDFs are merged with pymupdf. A chunk's files are named after the hash of
+# its .tex, so a chunk that hasn't changed since the last build is reused.
+def buildPDF(pages: list[str], no_extension_fname: str, doc_class = 'article',
+             chunk_pages = 20, workers = None):
+    build_dir = os.path.join(BUILD_DIR, no_extension_fname)
+    os.makedirs(build_dir, exist_ok=True)
 
-    os.chdir(cwd)
+    chunk_paths = []
+    stale = []
+    for start in range(0, len(pages), chunk_pages):
+        tex = texDocument(''.join(pages[start:start+chunk_pages]), doc_class)
+        digest = hashlib.sha256(tex.encode()).hexdigest()[:16]
+        tex_path = os.path.join(build_dir, 'chunk-{:04d}-{}.tex'.format(start // chunk_pages, digest))
+        chunk_paths.append(tex_path[:-len('.tex')] + '.pdf')
+        if not os.path.exists(chunk_paths[-1]):
+            with open(tex_path, 'w') as f:
+                f.write(tex)
+            stale.append(tex_path)
+    print('{}: {} of {} chunks to build'.format(no_extension_fname, len(stale), len(chunk_paths)))
+
+    # pdflatex does the work in its own processes, so threads are enough to
+    # keep workers of them busy
+    with concurrent.futures.ThreadPoolExecutor(workers or os.cpu_count()) as pool:
+        writeLog(pool.map(runPdflatex, stale))
+
+    # drop the files of chunks that have changed or no longer exist
+    keep = {os.path.basename(path)[:-len('.pdf')] for path in chunk_paths}
+    for name in os.listdir(build_dir):
+        if name.split('.')[0] not in keep:
+            os.remove(os.path.join(build_dir, name))
+
+    missing = [path for path in chunk_paths if not os.path.exists(path)]
+    if missing:
+        print("\n! {} not merged, missing {}".format(no_extension_fname, ', '.join(map(os.path.basename, missing))))
+        return
+
+    merged = pymupdf.open()
+    for path in chunk_paths:
+        with pymupdf.open(path) as chunk:
+            merged.insert_pdf(chunk)
+    merged.save(os.path.join(PICTURES_DIR, no_extension_fname + '.pdf'))
+    merged.close()
 
 def oldMain(do_placements = False):
-    grid = polyiamond.makeHexagonishGrid()
+    grid = placement_cache.cachedHexagonishGrid()
     grid_path, interior_points, grid_triangles = grid['perim'], grid['points'], grid['triangles']
     
     pdfHexiamondNames('names')
@@ -254,14 +290,15 @@ def oldMain(do_placements = False):
             pdfPlacements(hname, [hname])
 
 def coverMain(do_100_covers = False):
-    with open('a-few-covers.pkl', 'rb') as f:
-        covers = pickle.load(f)
-    
-    if do_100_covers:
-        pdfCovers('100-covers', covers)
-    else:
-        pdfCovers('example-cover', covers[76:77], doc_class = 'standalone')
-        pdfCovers('nice-cover', covers[38:39], doc_class = 'standalone')
+    store = cover_store.openStore(os.path.join(HERE, 'a-few-covers.hxs'))
+    try:
+        if do_100_covers:
+            pdfCovers('100-covers', cover_store.iterStore(store))
+        else:
+            pdfCovers('example-cover', [cover_store.readCover(store, 76)], doc_class = 'standalone')
+            pdfCovers('nice-cover', [cover_store.readCover(store, 38)], doc_class = 'standalone')
+    finally:
+        cover_store.closeStore(store)
 
 if __name__ == '__main__':
     oldMain()
@@ -0,0 +1,359 @@
+# Exact cover with multiplicities and colours: Knuth's Algorithm M
+# (TAOCP 7.2.2.1) on the same flat lists as dancing_links.
+#
+# Every primary item i carries bounds (u, v): a cover uses between u and v
+# options containing it. The piece names of a problem can so ask for k
+# copies of a piece, (k, k), or at most k, (0, k), without rows being
+# duplicated, which would make the search go through all k! orders of the
+# same copies. Secondary items are covered at most once, unless the options
+# sharing one give it the same colour: a row's value for a secondary key is
+# its colour there, and 1, as makeProblemMatrix writes, means uncoloured.
+# Triangles left secondary need not be covered at all, so a region can be
+# partly tiled.
+#
+# As in dancing_links, node 0 is the root, nodes 1..len(names) are the item
+# headers and the rest are the 1s of the matrix. On top of those, BOUND[i]
+# is how many more options may take item i and SLACK[i] = v - u. While an
+# item has BOUND > 0 its options are taken in top to bottom order, each
+# one removed from the item's list ("tweaked") once it has been tried, so a
+# multiset of options is found only once; untweak puts them all back.
+
+import time
+
+# rows are as returned by exact_cover.makeProblemMatrix; bounds maps each
+# primary key to (u, v). Keys without bounds are secondary, and a row with
+# only secondary keys is never chosen.
+def makeLinks(rows, bounds):
+    for key, (u, v) in bounds.items():
+        if not 0 <= u <= v or v < 1:
+            raise ValueError("bounds {} for {} are not 0 <= u <= v, v >= 1".format((u, v), key))
+
+    # the primary items first, in the order dancing_links.makeLinks has them
+    primary = {}
+    secondary = {}
+    for row in rows.values():
+        for key in row:
+            (primary if key in bounds else secondary)[key] = None
+    names = list(primary) + [key for key in bounds if key not in primary] + list(secondary)
+    column = {key: c for c, key in enumerate(names, 1)}
+
+    n = len(names) + 1
+    L = [0]*n
+    R = [0]*n
+    U = list(range(n))
+    D = list(range(n))
+    C = list(range(n))
+    S = [0]*n
+    colour = [0]*n
+    bound = [0]*n
+    slack = [0]*n
+    row_of = [-1]*n
+
+    prev = 0
+    for c in range(1, n):
+        key = names[c-1]
+        if key in bounds:
+            u, v = bounds[key]
+            bound[c], slack[c] = v, v - u
+            L[c], R[prev] = prev, c
+            prev = c
+        else:
+            L[c] = R[c] = c
+    L[0], R[prev] = prev, 0
+
+    colours = {}
+    first_node = {}
+    for ridx, row in rows.items():
+        first = None
+        for key, value in row.items():
+            c = column[key]
+            node = len(L)
+            C.append(c)
+            row_of.append(ridx)
+            if value != 1:
+                if key in bounds:
+                    raise ValueError("{} is primary and can't be given a colour".format(key))
+                colour.append(colours.setdefault(value, len(colours) + 1))
+            else:
+                colour.append(0)
+            U.append(U[c])
+            D.append(c)
+            D[U[c]] = node
+            U[c] = node
+            S[c] += 1
+            if first is None:
+                first = node
+                L.append(node)
+                R.append(node)
+            else:
+                L.append(L[first])
+                R.append(first)
+                R[L[first]] = node
+                L[first] = node
+        if first is not None:
+            first_node[ridx] = first
+
+    return {'L': L, 'R': R, 'U': U, 'D': D, 'C': C, 'S': S, 'colour': colour,
+            'bound': bound, 'slack': slack, 'primary': len(bounds) + 1, 'row': row_of,
+            'names': names, 'columns': column, 'first': first_node}
+
+# Bounds for tiling grid (its triangles) with the placements of
+# getPlacements: copies of every piece, or between 0 and copies for those
+# named in optional. Only the triangles in covered (all of grid by default)
+# must be covered; the rest stay secondary and may be left empty.
+def makeBounds(grid, poly_placements, copies = 1, optional = (), covered = None):
+    bounds = {}
+    for polyname in poly_placements:
+        bounds[polyname] = (0 if polyname in optional else copies, copies)
+    for tri in grid if covered is None else covered:
+        bounds[tri] = (1, 1)
+    return bounds
+
+# remove the other nodes of the option containing p from their lists,
+# leaving those whose colour a purified item already agrees with
+def hide(links, p):
+    R, U, D, C, S, colour = links['R'], links['U'], links['D'], links['C'], links['S'], links['colour']
+    j = R[p]
+    while j != p:
+        if colour[j] >= 0:
+            U[D[j]] = U[j]
+            D[U[j]] = D[j]
+            S[C[j]] -= 1
+        j = R[j]
+
+def unhide(links, p):
+    L, U, D, C, S, colour = links['L'], links['U'], links['D'], links['C'], links['S'], links['colour']
+    j = L[p]
+    while j != p:
+        if colour[j] >= 0:
+            U[D[j]] = j
+            D[U[j]] = j
+            S[C[j]] += 1
+        j = L[j]
+
+# hide every option of item i and take i off the active list
+def cover(links, i):
+    L, R, U, D, C, S, colour = links['L'], links['R'], links['U'], links['D'], links['C'], links['S'], links['colour']
+    p = D[i]
+    while p != i:
+        j = R[p]
+        while j != p:
+            if colour[j] >= 0:
+                U[D[j]] = U[j]
+                D[U[j]] = D[j]
+                S[C[j]] -= 1
+            j = R[j]
+        p = D[p]
+    L[R[i]] = L[i]
+    R[L[i]] = R[i]
+
+def uncover(links, i):
+    L, R, U, D, C, S, colour = links['L'], links['R'], links['U'], links['D'], links['C'], links['S'], links['colour']
+    L[R[i]] = i
+    R[L[i]] = i
+    p = U[i]
+    while p != i:
+        j = L[p]
+        while j != p:
+            if colour[j] >= 0:
+                U[D[j]] = j
+                D[U[j]] = j
+                S[C[j]] += 1
+            j = L[j]
+        p = U[p]
+
+# keep only the options giving p's secondary item p's colour, marking those
+# with colour -1 so hide leaves them be
+def purify(links, p):
+    D, C, colour = links['D'], links['C'], links['colour']
+    c, i = colour[p], C[p]
+    q = D[i]
+    while q != i:
+        if colour[q] == c:
+            colour[q] = -1
+        else:
+            hide(links, q)
+        q = D[q]
+
+def unpurify(links, p):
+    U, C, colour = links['U'], links['C'], links['colour']
+    c, i = colour[p], C[p]
+    q = U[i]
+    while q != i:
+        if colour[q] < 0:
+            colour[q] = c
+        else:
+            unhide(links, q)
+        q = U[q]
+
+# take the items of the option containing x other than x's own
+def selectNode(links, x):
+    R, C, colour, bound = links['R'], links['C'], links['colour'], links['bound']
+    primary = links['primary']
+    p = R[x]
+    while p != x:
+        j = C[p]
+        if j < primary:
+            bound[j] -= 1
+            if bound[j] == 0:
+                cover(links, j)
+        elif colour[p] == 0:
+            cover(links, j)
+        elif colour[p] > 0:
+            purify(links, p)
+        p = R[p]
+
+def unselectNode(links, x):
+    L, C, colour, bound = links['L'], links['C'], links['colour'], links['bound']
+    primary = links['primary']
+    p = L[x]
+    while p != x:
+        j = C[p]
+        if j < primary:
+            bound[j] += 1
+            if bound[j] == 1:
+                uncover(links, j)
+        elif colour[p] == 0:
+            uncover(links, j)
+        elif colour[p] > 0:
+            unpurify(links, p)
+        p = L[p]
+
+# take node x, the first of item i's list, off the list. While i is active
+# (not covered) its option has to be hidden from the other lists too.
+def tweak(links, x, i, active):
+    U, D, S = links['U'], links['D'], links['S']
+    if active:
+        hide(links, x)
+    d = D[x]
+    D[i] = d
+    U[d] = i
+    S[i] -= 1
+
+# put back every node tweaked off item i's list since first
+def untweak(links, first, i, active):
+    U, D, S = links['U'], links['D'], links['S']
+    x, y, z = first, i, D[i]
+    D[i] = first
+    k = 0
+    while x != z:
+        U[x] = y
+        k += 1
+        if active:
+            unhide(links, x)
+        y = x
+        x = D[x]
+    U[z] = y
+    S[i] += k
+    if not active:
+        uncover(links, i)
+
+# the active item with the fewest ways left to branch on it, len + 1 minus
+# the options it still needs; larger lists win ties, then the last item
+# (which for bounds of (1, 1) is dancing_links.chooseColumn's choice)
+def chooseItem(links):
+    R, S, bound, slack = links['R'], links['S'], links['bound'], links['slack']
+    best = None
+    c = R[0]
+    while c != 0:
+        need = bound[c] - slack[c]
+        theta = S[c] + 1 - need if need > 0 else S[c] + 1
+        if best is None or theta < best_theta or (theta == best_theta and S[c] >= S[best]):
+            best, best_theta = c, theta
+        c = R[c]
+    return best, best_theta
+
+# Yield each cover as a list of row indices, Algorithm M's steps M2 to M9
+# with x[l] the node tried at level l, or the item itself on the branch where
+# it takes no more options. The search gives up once time.monotonic() passes
+# deadline, or when visit(x), called on entering every level, returns a true
+# value. However it ends, the links are restored.
+def search(links, deadline = None, visit = None):
+    L, R, D, C, S = links['L'], links['R'], links['D'], links['C'], links['S']
+    bound, slack, row_of = links['bound'], links['slack'], links['row']
+    n = len(links['names']) + 1
+
+    x = []     # node tried at each level
+    first = [] # the first node tweaked at each level
+    item = []  # the item branched on at each level
+
+    # leave the deepest level, from step 6 when its x has been taken
+    def undo(taken):
+        i = item[-1]
+        if taken:
+            if x[-1] != i:
+                unselectNode(links, x[-1])
+            else:
+                L[R[i]] = i
+                R[L[i]] = i
+        if bound[i] == 0 and slack[i] == 0:
+            uncover(links, i)
+        else:
+            untweak(links, first[-1], i, bound[i] != 0)
+        bound[i] += 1
+        x.pop()
+        first.pop()
+        item.pop()
+
+    step = 2
+    try:
+        while True:
+            if step == 2:
+                if deadline is not None and time.monotonic() > deadline:
+                    return
+                if visit is not None and visit(x):
+                    return
+                if R[0] == 0:
+                    yield [row_of[p] for p in x if p >= n]
+                    step = 9
+                    continue
+                i, theta = chooseItem(links)
+                if theta <= 0:
+                    step = 9
+                    continue
+                bound[i] -= 1
+                if bound[i] == 0:
+                    cover(links, i)
+                x.append(D[i])
+                first.append(D[i])
+                item.append(i)
+                step = 5
+            elif step == 5:
+                i, xl = item[-1], x[-1]
+                if bound[i] == 0 and slack[i] == 0:
+                    step = 6 if xl != i else 8
+                    continue
+                if S[i] <= bound[i] - slack[i]:
+                    step = 8
+                    continue
+                if xl != i:
+                    tweak(links, xl, i, bound[i] != 0)
+                elif bound[i] != 0:
+                    L[R[i]] = L[i]
+                    R[L[i]] = R[i]
+                step = 6
+            elif step == 6:
+                if x[-1] != item[-1]:
+                    selectNode(links, x[-1])
+                step = 2
+            elif step == 7:
+                unselectNode(links, x[-1])
+                x[-1] = D[x[-1]]
+                step = 5
+            elif step == 8:
+                undo(False)
+                step = 9
+            else:
+                if not x:
+                    return
+                i = item[-1]
+                if x[-1] == i:
+                    L[R[i]] = i
+                    R[L[i]] = i
+                    step = 8
+                else:
+                    step = 7
+    finally:
+        # the search only stops on entering a level, with every x taken
+        while x:
+            undo(True)
@@ -0,0 +1,111 @@
+import os
+import time
+import multiprocessing
+import concurrent.futures
+import dancing_links
+
+# Parallel enumeration of exact covers. The dancing links search tree is
+# expanded to a fixed depth and the subtree under each prefix is searched
+# by a process pool in bounded chunks: a task returns after chunk_covers
+# covers or chunk_nodes nodes, with the position to resume from (as in
+# checkpoint), and the next chunk of that subtree is handed out as soon as
+# it comes back. No task runs long or holds much, so covers stream out as
+# they are found, and a few huge subtrees don't hold up the rest. The
+# results are merged back in prefix order: the stream is exactly what the
+# serial dancing_links.search would produce.
+#
+# Only the first chunks of the next window prefixes are searched ahead of
+# the one being read, and a prefix ahead stops getting new chunks once it
+# has buffered chunk_covers covers, so memory stays bounded. When the
+# generator is closed or the deadline passes, an event tells the running
+# tasks to stop within a few thousand nodes.
+
+_links = None
+_stop = None
+
+def _initWorker(rows, primaryKeys, stop):
+    global _links, _stop
+    _links = dancing_links.makeLinks(rows, primaryKeys)
+    _stop = stop
+
+# Search the subtree under prefix from resume, a position as in
+# dancing_links.search. Returns the covers found and the position of the
+# next node to enter, or None once the subtree is finished.
+def _searchChunk(prefix, resume, max_covers, max_nodes, deadline):
+    nodes = 0
+    stopped_at = None
+
+    def visit(choices, branches):
+        nonlocal nodes, stopped_at
+        nodes += 1
+        if (len(found) >= max_covers or nodes > max_nodes
+                or (nodes % 1024 == 0 and (_stop.is_set()
+                                            or (deadline is not None and time.monotonic() > deadline)))):
+            stopped_at = dancing_links.position(_links, choices, branches)
+            return True
+
+    for ridx in prefix:
+        dancing_links.selectRow(_links, ridx)
+    found = []
+    try:
+        for solution in dancing_links.search(_links, resume=resume, visit=visit):
+            found.append(prefix + solution)
+    finally:
+        for ridx in reversed(prefix):
+            dancing_links.unselectRow(_links, ridx)
+    return found, stopped_at
+
+# Yield each exact cover as a list of row indices. The search gives up once
+# time.monotonic() passes deadline; closing the generator stops it too.
+def parallelSearch(rows, primaryKeys, depth = 2, workers = None, deadline = None,
+                   chunk_covers = 256, chunk_nodes = 50000, window = None):
+    prefixes = dancing_links.expandPrefixes(dancing_links.makeLinks(rows, primaryKeys), depth)
+    workers = workers or os.cpu_count()
+    window = window or 2 * workers
+
+    stop = multiprocessing.Event()
+    pool = concurrent.futures.ProcessPoolExecutor(workers, initializer=_initWorker,
+                                                  initargs=(rows, primaryKeys, stop))
+    buffered = {} # prefix index: covers found and not yet yielded
+    resume = {}   # prefix index: where its next chunk starts, absent when done
+    pending = {}  # future: prefix index
+
+    def submit(i):
+        pending[pool.submit(_searchChunk, prefixes[i], resume[i], chunk_covers, chunk_nodes, deadline)] = i
+
+    try:
+        for i in range(min(window, len(prefixes))):
+            buffered[i], resume[i] = [], []
+            submit(i)
+        for current in range(len(prefixes)):
+            while True:
+                if deadline is not None and time.monotonic() > deadline:
+                    return
+                if buffered[current]:
+                    covers, buffered[current] = buffered[current], []
+                    yield from covers
+                    if current in resume and current not in pending.values():
+                        submit(current)
+                    continue
+                if current not in resume:
+                    break
+                timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+                done, _ = concurrent.futures.wait(pending, timeout, concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    i = pending.pop(future)
+                    found, stopped_at = future.result()
+                    buffered[i] += found
+                    if stopped_at is None:
+                        del resume[i]
+                    else:
+                        resume[i] = stopped_at
+                        if i == current or len(buffered[i]) < chunk_covers:
+                            submit(i)
+            del buffered[current]
+            ahead = current + window
+            if ahead < len(prefixes):
+                buffered[ahead], resume[ahead] = [], []
+                submit(ahead)
+    finally:
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
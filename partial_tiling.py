@@ -0,0 +1,93 @@
+import time
+import functools
+import dancing_links
+import bitmask_cover
+
+# Queries on partial tilings against a problem built once.
+#
+# makeSolver keeps the dancing links and the bitmask matrix of the problem
+# in memory. A query names the rows already placed; completeTiling selects
+# them in the links as if the search had chosen them, takes the first cover
+# of what is left and unselects them again, so the links are ready for the
+# next query. countCompletions goes through bitmask_cover's counter, which
+# is memoized on the filled mask: a partial state seen before, whichever
+# order its pieces were placed in, and every state reached while counting
+# are answered from the cache. First completions are cached by the set of
+# placed rows.
+
+# rows and primaryKeys are as returned by exact_cover.makeProblemMatrix
+def makeSolver(rows, primaryKeys, cache_size = 1 << 16, counter_size = 1 << 20):
+    links = dancing_links.makeLinks(rows, primaryKeys)
+    matrix = bitmask_cover.makeBitmaskMatrix(rows, primaryKeys)
+    position = {ridx: i for i, ridx in enumerate(matrix['rows'])}
+
+    placement = {}
+    for ridx, row in rows.items():
+        name = [key for key in row if isinstance(key, str)][0]
+        placement[(name, frozenset(key for key in row if not isinstance(key, str)))] = ridx
+
+    solver = {'rows': rows, 'links': links, 'matrix': matrix, 'position': position,
+              'placement': placement, 'count': bitmask_cover.makeCounter(matrix, counter_size)}
+
+    # a tuple, so no caller can change the cached answer
+    @functools.lru_cache(maxsize=cache_size)
+    def firstCompletion(placed):
+        cover = searchCompletion(solver, sorted(placed), None)
+        return None if cover is None else tuple(cover)
+
+    solver['first'] = firstCompletion
+    return solver
+
+# the row index of each placement, given as (piece name, triangle ids)
+def placedRows(solver, placements):
+    rows = []
+    for name, triangles in placements:
+        key = (name, frozenset(triangles))
+        if key not in solver['placement']:
+            raise ValueError("{} is not a placement of this problem".format(name))
+        rows.append(solver['placement'][key])
+    return rows
+
+# the filled mask of the placed rows, checking they fit together
+def usedMask(solver, placed):
+    masks, position = solver['matrix']['masks'], solver['position']
+    used = 0
+    for ridx in placed:
+        if ridx not in position:
+            raise ValueError("row {} covers no primary column".format(ridx))
+        mask = masks[position[ridx]]
+        if mask & used:
+            raise ValueError("row {} overlaps the other placements".format(ridx))
+        used |= mask
+    return used
+
+def searchCompletion(solver, placed, deadline):
+    links = solver['links']
+    for ridx in placed:
+        dancing_links.selectRow(links, ridx)
+    try:
+        found = dancing_links.search(links, deadline)
+        cover = next(found, None)
+        found.close()
+    finally:
+        for ridx in reversed(placed):
+            dancing_links.unselectRow(links, ridx)
+    return None if cover is None else placed + cover
+
+# The first cover that uses every placed row, as row indices (the placed
+# ones first), or None if there is none. With timeout, None is also
+# returned once the search has run that many seconds, and not cached.
+def completeTiling(solver, placed, timeout = None):
+    placed = list(placed)
+    usedMask(solver, placed)
+    if timeout is None:
+        cover = solver['first'](frozenset(placed))
+        return None if cover is None else list(cover)
+    return searchCompletion(solver, sorted(placed), time.monotonic() + timeout)
+
+# the number of covers that use every placed row
+def countCompletions(solver, placed):
+    return solver['count'](usedMask(solver, placed))
+
+def cacheInfo(solver):
+    return {'first': solver['first'].cache_info()._asdict(), 'count': solver['count'].cache_info()._asdict()}
@@ -0,0 +1,168 @@
+import os
+import json
+import array
+import hashlib
+import tempfile
+import polyiamond
+
+# On-disk cache of the hexagonish grid and of getPlacements results.
+#
+# Entries are keyed by a SHA-256 of the region's triangles, the piece dict
+# and the source of polyiamond.py, so editing the pieces, the region or the
+# placement code invalidates them. Each entry is a short JSON header
+# followed by one flat array of int32s: paths as coordinate pairs and
+# triangles as their ids. Reading an entry refreshes its mtime and writing
+# one evicts the least recently used entries once the directory grows past
+# max_bytes. Several processes may share the directory: each writes to its
+# own temp file and renames it into place, and an entry that vanishes under
+# a reader or the pruner is skipped.
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')
+MAX_BYTES = 64 << 20
+MAGIC = b'HXC2'
+
+def codeVersion():
+    with open(polyiamond.__file__, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def entryKey(*parts):
+    h = hashlib.sha256(codeVersion().encode())
+    for part in parts:
+        h.update(repr(part).encode())
+    return h.hexdigest()
+
+def packPath(path, values):
+    values.append(len(path))
+    for a, b in path:
+        values.extend((a, b))
+
+def unpackPath(values, i):
+    n = values[i]
+    path = [(values[j], values[j+1]) for j in range(i+1, i+1+2*n, 2)]
+    return path, i+1+2*n
+
+def packTriangles(tris, values):
+    values.append(len(tris))
+    values.extend(tris)
+
+def unpackTriangles(values, i):
+    n = values[i]
+    return set(values[i+1:i+1+n]), i+1+n
+
+def writeEntry(path, meta, values):
+    header = json.dumps(meta).encode()
+    fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC)
+            f.write(len(header).to_bytes(4, 'little'))
+            f.write(header)
+            array.array('i', values).tofile(f)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+# the entry at path, or None if there is none (or another process just
+# evicted it)
+def readEntry(path):
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    if data[:4] != MAGIC:
+        return None
+    n = int.from_bytes(data[4:8], 'little')
+    meta = json.loads(data[8:8+n])
+    values = array.array('i')
+    values.frombytes(data[8+n:])
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+    return meta, values
+
+def prune(cache_dir = CACHE_DIR, max_bytes = MAX_BYTES):
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith('.tmp'): # another process' entry being written
+            continue
+        path = os.path.join(cache_dir, name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+def clearCache(cache_dir = CACHE_DIR):
+    if os.path.isdir(cache_dir):
+        for name in os.listdir(cache_dir):
+            os.remove(os.path.join(cache_dir, name))
+
+def loadOrCompute(key, compute, encode, decode, cache_dir, max_bytes):
+    path = os.path.join(cache_dir, key + '.bin')
+    entry = readEntry(path)
+    if entry is not None:
+        return decode(*entry)
+    result = compute()
+    os.makedirs(cache_dir, exist_ok=True)
+    values = []
+    meta = encode(result, values)
+    writeEntry(path, meta, values)
+    prune(cache_dir, max_bytes)
+    return result
+
+def cachedHexagonishGrid(cache_dir = CACHE_DIR, max_bytes = MAX_BYTES):
+    def encode(grid, values):
+        packPath(grid['perim'], values)
+        packPath(grid['points'], values)
+        packTriangles(grid['triangles'], values)
+        return {'kind': 'grid'}
+
+    def decode(meta, values):
+        perim, i = unpackPath(values, 0)
+        points, i = unpackPath(values, i)
+        triangles, i = unpackTriangles(values, i)
+        return {'perim': perim, 'points': points, 'triangles': triangles}
+
+    return loadOrCompute(entryKey('makeHexagonishGrid'), polyiamond.makeHexagonishGrid,
+                         encode, decode, cache_dir, max_bytes)
+
+def cachedPlacements(grid, hexiamonds, cache_dir = CACHE_DIR, max_bytes = MAX_BYTES):
+    region = sorted(grid['triangles'])
+    # in the given order, which is the order of the placements and so of the rows
+    pieces = [(name, list(path)) for name, path in hexiamonds.items()]
+
+    def encode(hexi_p, values):
+        for placements in hexi_p.values():
+            for path, tris in placements:
+                packPath(path, values)
+                packTriangles(tris, values)
+        return {'kind': 'placements', 'names': list(hexi_p),
+                'counts': [len(placements) for placements in hexi_p.values()]}
+
+    def decode(meta, values):
+        hexi_p = {}
+        i = 0
+        for name, count in zip(meta['names'], meta['counts']):
+            placements = []
+            for _ in range(count):
+                path, i = unpackPath(values, i)
+                tris, i = unpackTriangles(values, i)
+                placements.append((path, tris))
+            hexi_p[name] = placements
+        return hexi_p
+
+    return loadOrCompute(entryKey('getPlacements', region, pieces),
+                         lambda: polyiamond.getPlacements(grid, hexiamonds),
+                         encode, decode, cache_dir, max_bytes)
@@ -1,5 +1,5 @@
 import math
-import itertools
+from fractions import Fraction
 # coordinate (a, b) corresponds to Eisenstein integer a + b\omega
 
 # hexiamond names from https://mathworld.wolfram.com/Hexiamond.html
@@ -19,9 +19,6 @@ HEXIAMONDS = {'bar'      : [(0,0), (1,0), (2,0), (3,0), (4,1), (3,1), (2,1), (1,
 def sumTuples(t1: tuple[int], t2: tuple[int]):
     return tuple(sum(z) for z in zip(t1, t2))
 
-def triwise(p: list[int]):
-    return list(map(lambda x: [x[0][0], x[0][1], x[1][1]], itertools.pairwise(itertools.pairwise(p))))
-
 def eisToCar(eisInt):
     a, b = eisInt
     bwRe = -b/2
@@ -30,8 +27,20 @@ def eisToCar(eisInt):
     y = bwIm
     return (x, y)
 
-def distance(p1, p2):
-    return math.sqrt((p2[0]-p1[0])**2 + (p2[1]-p1[1])**2)
+# p is a cartesian point
+def rotate30(p):
+    ''' (1, 0) -> (sqrt(3)/2, 1/2)
+        (0, 1) -> (-1/2, sqrt(3)/2)
+    \\begin{pmatrix}
+    sqrt(3)/2 & -1/2 \\
+    1/2       & sqrt(3)/2
+    \\end{pmatrix}
+    '''
+    x, y = p
+    sqrt3o2 = math.sqrt(3)/2
+    rot_x = x*sqrt3o2 + y*-0.5
+    rot_y = x*0.5 + y*sqrt3o2
+    return rot_x, rot_y
 
 def averageCar(eisens):
     cartesians = list(map(lambda x: eisToCar(x), eisens))
@@ -39,51 +48,75 @@ def averageCar(eisens):
     avgy = sum(map(lambda x: x[1], cartesians)) / len(eisens)
     return (avgx, avgy)
 
-# return triangles that make up a hexiamond
-def getTriangles(in_eisen_path: list[tuple[int]], hname: str):
+# Triangles are passed around as ints everywhere: a lattice triangle is
+# either up, {(a,b), (a+1,b), (a+1,b+1)}, or down,
+# {(a,b), (a+1,b+1), (a,b+1)}, so it packs into one int: its lowest vertex,
+# each coordinate offset into a TRI_COORD_BITS-bit field, above a bit that is
+# set for up triangles. Translating by (da, db) adds
+# (da << (TRI_COORD_BITS+1)) + (db << 1) to the id of every triangle.
+TRI_COORD_BITS = 15
+TRI_OFFSET = 1 << (TRI_COORD_BITS-1)
+TRI_MASK = (1 << TRI_COORD_BITS) - 1
 
-    is_convex = not (hname == 'hook' or hname == 'yacht' or hname == 'lobster')
-    
-    eisen_path = in_eisen_path.copy()
-    triangles = set()
+def makeTriangleId(a: int, b: int, up: int):
+    return ((a+TRI_OFFSET) << (TRI_COORD_BITS+1)) | ((b+TRI_OFFSET) << 1) | up
 
-    if hname == 'hexagon': #this is kind of gross
-        eisen_path += [(1,1)]
+def triangleId(tri: frozenset[tuple[int]]):
+    a, b = min(tri)
+    return makeTriangleId(a, b, 1 if (a+1, b) in tri else 0)
 
-    trips = triwise(eisen_path)
-    triplets = {frozenset(three): three for three in trips}
+def translationOffset(da: int, db: int):
+    return (da << (TRI_COORD_BITS+1)) + (db << 1)
 
-    center = averageCar(eisen_path)
-    
-    def trisAround(eisen: tuple[int]):
-        tris = set()
-        directions = [(1,0),(1,1),(0,1),(-1,0),(-1,-1),(0,-1)]
-        prev = (0,-1)
-        for direc in directions:
-            tris.add(frozenset({eisen, sumTuples(eisen, direc), sumTuples(eisen, prev)}))
-            prev = direc
-        return tris
-
-    def inEisens(tri: set[tuple[int]]):
-        for e in tri:
-            if e not in eisen_path:
-                return False
-        if is_convex: #yeah, also sloppy but works
-            return True
-        if tri in triplets: # detect empty concave trianlge
-            threePath = triplets[tri]
-            distance_from_center_first = distance(eisToCar(threePath[0]), center)
-            distance_from_center_second = distance(eisToCar(threePath[1]), center)
-            if distance_from_center_first > distance_from_center_second:
-                return False
-        return True
-            
-    for point in eisen_path:
-        tsAround = trisAround(point)
-        for t in tsAround:
-            if inEisens(t):
-                triangles.add(t)
-                
+# the lowest vertex of the triangle with id tid
+def triangleVertex(tid: int):
+    return ((tid >> (TRI_COORD_BITS+1)) - TRI_OFFSET, ((tid >> 1) & TRI_MASK) - TRI_OFFSET)
+
+# the corners of the triangle with id tid, counter-clockwise
+def triangleCorners(tid: int):
+    a, b = triangleVertex(tid)
+    if tid & 1:
+        return [(a, b), (a+1, b), (a+1, b+1)]
+    return [(a, b), (a+1, b+1), (a, b+1)]
+
+# the three triangles sharing an edge with tid:
+# up(a,b) touches down(a,b), down(a+1,b) and down(a,b-1),
+# down(a,b) touches up(a,b), up(a-1,b) and up(a,b+1)
+def triangleNeighbours(tid: int):
+    a_step, b_step = 1 << (TRI_COORD_BITS+1), 1 << 1
+    if tid & 1:
+        return (tid-1, tid-1+a_step, tid-1-b_step)
+    return (tid+1, tid+1-a_step, tid+1+b_step)
+
+# the sorted lattice points on the corners of the triangles
+def trianglePoints(tids):
+    return sorted({p for tid in tids for p in triangleCorners(tid)})
+
+def triangleFromId(tid: int):
+    return frozenset(triangleCorners(tid))
+
+# return the ids of the triangles inside a closed Eisenstein integer path,
+# by the even-odd rule on their centroids: (a+2/3, b+1/3) for up and
+# (a+1/3, b+2/3) for down triangles. Centroids are never on a lattice line,
+# so every comparison is strict and the arithmetic is exact.
+def pathTriangles(eisen_path: list[tuple[int]]):
+    bands = {} # edges crossing each horizontal band b < y < b+1
+    for (a1, b1), (a2, b2) in zip(eisen_path, eisen_path[1:] + eisen_path[:1]):
+        if b1 == b2:
+            continue
+        if b1 > b2:
+            a1, b1, a2, b2 = a2, b2, a1, b1
+        for b in range(b1, b2):
+            bands.setdefault(b, []).append((a1, b1, a2, b2))
+
+    triangles = set()
+    for b, edges in bands.items():
+        for up, third in ((1, Fraction(2, 3)), (0, Fraction(1, 3))):
+            y = b + 1 - third
+            xs = sorted(a1 + (y-b1)*(a2-a1)/(b2-b1) for a1, b1, a2, b2 in edges)
+            for x_in, x_out in zip(xs[0::2], xs[1::2]):
+                for a in range(math.floor(x_in-third)+1, math.ceil(x_out-third)):
+                    triangles.add(makeTriangleId(a, b, up))
     return triangles
 
 # \sigma: rotate passed Eisenstein integers by 60 degrees counter-clockwise
@@ -98,6 +131,17 @@ def rotate60(eisen_path: list[tuple[int]]):
 def reflect(eisen_path: list[tuple[int]]):
     return list(map(lambda x: (x[1], x[0]), eisen_path))
 
+# one of the twelve symmetries of the lattice that fix the origin, as a
+# function on a single Eisenstein integer: \sigma^k, preceded by \tau when
+# mirrored
+def latticeSymmetry(k: int, mirrored: bool):
+    def apply(eisen: tuple[int]):
+        a, b = (eisen[1], eisen[0]) if mirrored else eisen
+        for _ in range(k % 6):
+            a, b = a-b, a
+        return (a, b)
+    return apply
+
 # subtract the minimum real value from each Eisenstein integer and
 # subtract the minimum complex value from each Eisenstein integer
 def normalize(eisen_path: list[tuple[int]]):
@@ -105,34 +149,62 @@ def normalize(eisen_path: list[tuple[int]]):
     minb = min(map(lambda x: x[1], eisen_path))
     return list(map(lambda x: (x[0]-mina, x[1]-minb), eisen_path))
 
-# return unique orientations as a list of tuples of the form (closed_Eisenstein_integer_path, sets_of_triangles)
+# \sigma and \tau on triangle ids:
+# \sigma(up(a,b)) = down(a-b, a)     \sigma(down(a,b)) = up(a-b-1, a)
+# \tau(up(a,b))   = down(b, a)       \tau(down(a,b))   = up(b, a)
+def rotateTriangle(tid: int):
+    a, b = triangleVertex(tid)
+    return makeTriangleId(a-b, a, 0) if tid & 1 else makeTriangleId(a-b-1, a, 1)
+
+def reflectTriangle(tid: int):
+    a, b = triangleVertex(tid)
+    return makeTriangleId(b, a, 1 - (tid & 1))
+
+# translate triangle ids by the same shift normalize applies to eisen_path
+def normalizeTriangles(tris, eisen_path: list[tuple[int]]):
+    offset = translationOffset(-min(map(lambda x: x[0], eisen_path)), -min(map(lambda x: x[1], eisen_path)))
+    return {tid + offset for tid in tris}
+
+_orientations = {}
+
+# return unique orientations as a list of tuples of the form (closed_Eisenstein_integer_path, sets_of_triangle_ids).
+# The triangles are found once from the path and then moved with the path
+# by \sigma and \tau; orientations are told apart by their sorted ids.
+# Results are memoized per path and must not be modified.
 def orientations(hname: str, hexiamond: list[tuple[int]]):
+    key = tuple(hexiamond)
+    if key in _orientations:
+        return _orientations[key]
 
     unique_triangle_sets = set()
 
     unique_rot = []
     unique_ref = []
-    
+
     prev = hexiamond
+    prev_tris = pathTriangles(hexiamond)
 
     def addIfUnique(u_paths, eisen_path, path_tris):
-        if path_tris not in unique_triangle_sets:
-            frz_tris = frozenset(path_tris)
-            unique_triangle_sets.add(frz_tris)
+        canonical = tuple(sorted(path_tris))
+        if canonical not in unique_triangle_sets:
+            unique_triangle_sets.add(canonical)
             u_paths.append((eisen_path, path_tris))
-    
+
     for _ in range(6):
-        rotated = normalize(rotate60(prev))
-        tri_rot = getTriangles(rotated, hname)
+        rotated = rotate60(prev)
+        tri_rot = normalizeTriangles(map(rotateTriangle, prev_tris), rotated)
+        rotated = normalize(rotated)
         addIfUnique(unique_rot, rotated, tri_rot)
-        prev = rotated
+        prev, prev_tris = rotated, tri_rot
 
-    for rot_path,rot_tri in unique_rot:
-        reflected = normalize(reflect(rot_path))
-        tri_ref = getTriangles(reflected, hname)
+    for rot_path, rot_tri in unique_rot:
+        reflected = reflect(rot_path)
+        tri_ref = normalizeTriangles(map(reflectTriangle, rot_tri), reflected)
+        reflected = normalize(reflected)
         addIfUnique(unique_ref, reflected, tri_ref)
-        
-    return {'rotations':unique_rot, 'mirrors':unique_ref}
+
+    _orientations[key] = {'rotations':unique_rot, 'mirrors':unique_ref}
+    return _orientations[key]
 
 # return the manhattan distance from the eisenInt to the origin
 def manhattanDist(a, b):
@@ -150,41 +222,37 @@ def makeHexagonishGrid():
     for t in transitions:
         grid_perimeter.append(sumTuples(grid_perimeter[-1], t))
 
-    min_dist = min(map(lambda x: manhattanDist(x[0], x[1]), grid_perimeter))
-
-    grid_points = set(grid_perimeter)
-
-    for b in range(-5, 5):
-        for a in range(-5, 5):
-            if manhattanDist(a, b) <= min_dist:
-                grid_points.add((a,b))
-                
-    grid_points = sorted(grid_points)
-        
-    return {'perim': grid_perimeter, 'points': grid_points, 'triangles': getTriangles(grid_points, '')}
+    grid_triangles = pathTriangles(grid_perimeter)
+    return {'perim': grid_perimeter, 'points': trianglePoints(grid_triangles), 'triangles': grid_triangles}
 
 def getPlacements(grid, hexiamonds):
     hexi_placements = {hname : [] for hname in hexiamonds}
 
-    def shiftTriangles(tris, point):
-        triangles = set()
-        for tri in tris:
-            shifted_tri = set()
-            for t in tri:
-                shifted_tri.add(sumTuples(t, point))
-            triangles.add(frozenset(shifted_tri))
-        return triangles
-    
+    # the grid's down and up triangles
+    region = [set(), set()]
+    for tid in grid['triangles']:
+        region[tid & 1].add(tid)
+
     def oriPlacementsInGrid(ori_path, ori_triangles, hname):
-        count = 0
+        ids = list(ori_triangles)
+
+        # the translations taking every triangle of the orientation into the
+        # grid, as id offsets: each triangle contributes the offsets onto grid
+        # triangles pointing the same way, and the placements are what all of
+        # them agree on
+        offsets = None
+        for tid in ids:
+            shifted = map((-tid).__add__, region[tid & 1])
+            offsets = set(shifted) if offsets is None else offsets.intersection(shifted)
+
+        anchor = triangleVertex(ids[0])
         placements = []
-        for point in grid['points']:
-            shifted_path = list(map(lambda x: sumTuples(x, point), ori_path))
-            if all(map(lambda x: x in grid['points'], shifted_path)): #if the perimeter is in the grid, so are the triangles
-                shifted_triangles = shiftTriangles(ori_triangles, point)
-                placements.append((shifted_path, shifted_triangles))
-                count += 1
-        assert count == len(placements)
+        for offset in sorted(offsets): # sorted ids are sorted (a, b) shifts
+            a, b = triangleVertex(ids[0] + offset)
+            da, db = a-anchor[0], b-anchor[1]
+            shifted_path = [(x+da, y+db) for x, y in ori_path]
+            shifted_triangles = {tid + offset for tid in ids}
+            placements.append((shifted_path, shifted_triangles))
         return placements
     
     for hname, hexiamond in hexiamonds.items():
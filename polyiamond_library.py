@@ -0,0 +1,180 @@
+import sys
+import bisect
+import polyiamond
+
+# Every polyiamond with n triangles, grown with Redelmeier's algorithm
+# (https://doi.org/10.1016/0012-365X(81)90237-5) on triangle ids.
+#
+# A fixed polyiamond is found from its smallest triangle id, the root, by
+# adding one edge-neighbour at a time from an untried list. Only triangles
+# above the root are ever added, and a triangle leaves the untried list for
+# good once it has been tried, so every fixed polyiamond is reached exactly
+# once and nothing has to be remembered between them. One-sided and free
+# polyiamonds are the fixed ones that are the smallest of their images under
+# the rotations (and reflections), so they are deduplicated without a table
+# either and memory stays proportional to n.
+
+# the ids translated so the smallest a and b of their vertices are 0,
+# like polyiamond.normalize, as a sorted tuple
+def normalizeIds(tids):
+    vertices = [polyiamond.triangleVertex(tid) for tid in tids]
+    offset = polyiamond.translationOffset(-min(a for a, _ in vertices), -min(b for _, b in vertices))
+    return tuple(sorted(tid + offset for tid in tids))
+
+# the normalized images of tids under the 6 rotations, and the 6 reflections
+# too with mirrors
+def images(tids, mirrors = True):
+    result = []
+    rotated = tids
+    for _ in range(6):
+        rotated = [polyiamond.rotateTriangle(tid) for tid in rotated]
+        result.append(normalizeIds(rotated))
+        if mirrors:
+            result.append(normalizeIds([polyiamond.reflectTriangle(tid) for tid in rotated]))
+    return result
+
+def canonicalForm(tids, mirrors = True):
+    return min(images(tids, mirrors))
+
+# yield every fixed polyiamond with n triangles as a normalized tuple of ids
+def fixedPolyiamonds(n: int):
+    if n < 1:
+        return
+    for up in (0, 1):
+        root = polyiamond.makeTriangleId(0, 0, up)
+        cells = []
+        seen = {root}
+
+        def grow(untried):
+            while untried:
+                tid = untried.pop()
+                cells.append(tid)
+                if len(cells) == n:
+                    yield normalizeIds(cells)
+                else:
+                    new = [t for t in polyiamond.triangleNeighbours(tid) if t > root and t not in seen]
+                    seen.update(new)
+                    yield from grow(untried + new)
+                    seen.difference_update(new)
+                cells.pop()
+
+        yield from grow([root])
+
+# one-sided polyiamonds are told apart up to rotation
+def oneSidedPolyiamonds(n: int):
+    for tids in fixedPolyiamonds(n):
+        if tids == canonicalForm(tids, mirrors=False):
+            yield tids
+
+# free polyiamonds are told apart up to rotation and reflection
+def freePolyiamonds(n: int):
+    for tids in fixedPolyiamonds(n):
+        if tids == canonicalForm(tids):
+            yield tids
+
+# the lattice steps from p to q, as the vertices after p
+def latticeWalk(p, q):
+    a, b = p
+    walk = []
+    while (a, b) != q:
+        da, db = q[0]-a, q[1]-b
+        if da*db > 0:
+            a, b = a + (1 if da > 0 else -1), b + (1 if db > 0 else -1)
+        elif da != 0:
+            a += 1 if da > 0 else -1
+        else:
+            b += 1 if db > 0 else -1
+        walk.append((a, b))
+    return walk
+
+# the edges (p, q) of the triangles that no other of them shares, directed
+# with the triangles on the left: up(a,b)'s edges, from (a,b) on, face
+# down(a,b-1), down(a+1,b) and down(a,b), and down(a,b)'s face up(a,b),
+# up(a,b+1) and up(a-1,b) (see polyiamond.triangleNeighbours)
+def boundaryEdges(tids):
+    tids = tids if isinstance(tids, (set, frozenset)) else set(tids)
+    edges = []
+    for tid in tids:
+        corners = polyiamond.triangleCorners(tid)
+        ahead = polyiamond.triangleNeighbours(tid)
+        ahead = (ahead[2], ahead[1], ahead[0]) if tid & 1 else (ahead[0], ahead[2], ahead[1])
+        for k in range(3):
+            if ahead[k] not in tids:
+                edges.append((corners[k], corners[(k+1) % 3]))
+    return edges
+
+# A closed Eisenstein integer path around the triangles, counter-clockwise
+# from the smallest vertex, with a vertex at every unit step like the paths
+# in polyiamond.HEXIAMONDS, so that polyiamond.pathTriangles(path) gives the
+# triangles back. A piece with holes still gets a single path: each hole is
+# joined to the boundary by a walk that the path goes along and then back,
+# and edges passed twice cancel under the even-odd rule. The walk runs
+# from the hole's smallest vertex straight towards smaller a, to the nearest
+# boundary vertex on its line; that belongs to a loop with a smaller
+# smallest vertex, so every hole ends up joined to the outside.
+def boundaryPath(tids):
+    out = {}
+    for p, q in boundaryEdges(tids):
+        out.setdefault(p, []).append(q)
+    for targets in out.values():
+        targets.sort(reverse=True)
+
+    # the boundary's loops: the outer one holds the smallest vertex
+    component = {}
+    loops = []
+    for start in sorted(out):
+        if start in component:
+            continue
+        component[start] = len(loops)
+        loop = [start]
+        todo = [start]
+        while todo:
+            for w in out[todo.pop()]:
+                if w not in component:
+                    component[w] = len(loops)
+                    loop.append(w)
+                    todo.append(w)
+        loops.append(loop)
+
+    # the a of the boundary vertices on each line of constant b
+    lines = {}
+    for a, b in sorted(out):
+        lines.setdefault(b, []).append(a)
+    for loop in loops[1:]:
+        q = min(loop)
+        line = lines[q[1]]
+        p = (line[bisect.bisect_left(line, q[0]) - 1], q[1])
+        walk = [p] + latticeWalk(p, q)
+        for v, w in zip(walk, walk[1:]):
+            out.setdefault(v, []).append(w)
+            out.setdefault(w, []).append(v)
+
+    # Hierholzer's algorithm for a closed walk over every boundary edge
+    stack = [min(out)]
+    path = []
+    while stack:
+        targets = out[stack[-1]]
+        if targets:
+            stack.append(targets.pop())
+        else:
+            path.append(stack.pop())
+    path.reverse()
+    return path[:-1]
+
+# the free polyiamonds with n triangles, ready for polyiamond.getPlacements,
+# which adds the mirror images of the chiral ones itself
+def makePieces(n: int):
+    return {'{}-iamond-{}'.format(n, i): boundaryPath(tids) for i, tids in enumerate(freePolyiamonds(n))}
+
+if __name__ == '__main__':
+    max_n = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    print('{:>3} {:>10} {:>10} {:>10}'.format('n', 'fixed', 'one-sided', 'free'))
+    for n in range(1, max_n+1):
+        fixed = one_sided = free = 0
+        for tids in fixedPolyiamonds(n):
+            fixed += 1
+            if tids == canonicalForm(tids, mirrors=False):
+                one_sided += 1
+                if tids == canonicalForm(tids):
+                    free += 1
+        print('{:3} {:10} {:10} {:10}'.format(n, fixed, one_sided, free))
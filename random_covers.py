@@ -0,0 +1,136 @@
+import os
+import sys
+import random
+import argparse
+import concurrent.futures
+import dancing_links
+
+# Covers sampled from all over the search tree instead of enumerated.
+#
+# The first covers dancing_links.search finds all share the rows it chose
+# near the root, so they differ only in a few pieces. A sample here is a
+# restart: a search with a seeded random.Random, which breaks ties between
+# columns at random and tries each column's rows in a random order, cut off
+# after cutoff nodes. The heavy tail of the time to a first cover is what
+# makes restarts pay: most seeds find one in a few hundred nodes, a few
+# wander into subtrees with none for many thousands. A restart that hits
+# the cutoff is retried with the next seed from the same generator and
+# twice the cutoff, so every sample ends: with a cover, or with none once a
+# restart has gone through the whole tree without being cut off.
+#
+# Each sample gets its own seed drawn from seed, so the covers only depend
+# on seed, not on the number of workers.
+
+# one restart: the first cover found within cutoff nodes (None if there is
+# none), the number of nodes visited and whether the search was cut off
+# (if it wasn't and found nothing, the problem has no cover)
+def randomCover(links, rng, cutoff, deadline = None):
+    nodes = 0
+    cut = False
+
+    def visit(choices, branches):
+        nonlocal nodes, cut
+        nodes += 1
+        cut = nodes > cutoff
+        return cut
+
+    found = dancing_links.search(links, deadline, visit=visit, rng=rng)
+    cover = next(found, None)
+    found.close()
+    return cover, nodes, cut
+
+# restart from seed until a cover turns up; returns the cover's sorted row
+# indices (None if there is no cover at all), the number of restarts and
+# the nodes visited in all of them
+def sampleCover(links, seed, cutoff):
+    rng = random.Random(seed)
+    restarts = nodes = 0
+    while True:
+        cover, visited, cut = randomCover(links, rng, cutoff)
+        restarts += 1
+        nodes += visited
+        if cover is not None:
+            return sorted(cover), restarts, nodes
+        if not cut:
+            return None, restarts, nodes
+        cutoff *= 2
+
+_links = None
+
+def _initWorker(rows, primaryKeys):
+    global _links
+    _links = dancing_links.makeLinks(rows, primaryKeys)
+
+def _sample(seed, cutoff):
+    return sampleCover(_links, seed, cutoff)
+
+# Yield up to count distinct covers, as lists of row indices, each from its
+# own restarts, spread over workers processes (1 for this process). Fewer
+# come back if the problem has no cover, or once max_duplicates samples in a
+# row have all been covers already yielded, which is how a problem with
+# fewer than count covers shows. stats, if given, is filled in with the
+# samples, restarts and nodes it took.
+def sampleCovers(rows, primaryKeys, count, seed = None, cutoff = 1000, workers = 1, stats = None,
+                 max_duplicates = 100):
+    rng = random.Random(seed)
+    stats = {} if stats is None else stats
+    for key in ('samples', 'restarts', 'nodes', 'duplicates'):
+        stats.setdefault(key, 0)
+    seen = set()
+    repeated = 0
+    pool = None
+    if workers == 1:
+        _initWorker(rows, primaryKeys)
+    else:
+        pool = concurrent.futures.ProcessPoolExecutor(workers or os.cpu_count(), initializer=_initWorker,
+                                                      initargs=(rows, primaryKeys))
+    try:
+        while len(seen) < count:
+            seeds = [rng.getrandbits(64) for _ in range(count - len(seen))]
+            if pool is None:
+                found = (_sample(s, cutoff) for s in seeds)
+            else:
+                found = pool.map(_sample, seeds, [cutoff] * len(seeds))
+            for cover, restarts, nodes in found:
+                stats['samples'] += 1
+                stats['restarts'] += restarts
+                stats['nodes'] += nodes
+                if cover is None:
+                    return
+                if tuple(cover) in seen:
+                    stats['duplicates'] += 1
+                    repeated += 1
+                    if repeated >= max_duplicates:
+                        return
+                    continue
+                repeated = 0
+                seen.add(tuple(cover))
+                yield cover
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+if __name__ == '__main__':
+    import polyiamond
+    import exact_cover
+    import placement_cache
+    import cover_store
+
+    parser = argparse.ArgumentParser(description='Sample covers from all over the search tree.')
+    parser.add_argument('count', type=int, nargs='?', default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--cutoff', type=int, default=1000, help='nodes before the first restart')
+    parser.add_argument('--workers', type=int, default=1, help='processes, 0 for one per cpu')
+    parser.add_argument('--output', default='sampled-covers.hxs', help='cover store the covers are appended to')
+    args = parser.parse_args()
+
+    grid = placement_cache.cachedHexagonishGrid()
+    hexi_p = placement_cache.cachedPlacements(grid, polyiamond.HEXIAMONDS)
+    rows, keys = exact_cover.makeProblemMatrix(grid['triangles'], hexi_p)
+
+    stats = {}
+    cover_store.createStore(args.output, polyiamond.HEXIAMONDS, hexi_p)
+    written = cover_store.appendCovers(args.output, sampleCovers(rows, keys, args.count, args.seed, args.cutoff,
+                                                                 args.workers, stats))
+    print('covers:', written, file=sys.stderr)
+    print('restarts: {restarts}, nodes: {nodes}, duplicates: {duplicates}'.format(**stats), file=sys.stderr)
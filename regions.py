@@ -0,0 +1,160 @@
+import sys
+import json
+import math
+import polyiamond
+import polyiamond_library
+
+# Regions to tile, of any shape, as grids like makeHexagonishGrid's:
+#   'triangles'   the set of triangle ids, all polyiamond.getPlacements needs
+#   'points'      the lattice points on their corners
+#   'perim'       one closed Eisenstein path around them, with any holes
+#                 joined to the outside (polyiamond_library.boundaryPath),
+#                 so pathTriangles(perim) gives the triangles back
+#   'boundaries'  the outer boundary and that of every hole as separate
+#                 closed paths, which is what the renderer draws
+# A region is built from its triangles, whichever way they were given: from
+# closed paths, the first the outside and the others holes, filled by the
+# even-odd rule; from a mask, a picture of the triangles in text; or read
+# from a file holding either. Everything is linear in the number of
+# triangles (or the length of the paths) up to sorting, however many holes
+# there are, so regions of tens of thousands of triangles take well under a
+# second.
+#
+# In a mask, line i from the bottom is the band of triangles with lowest
+# vertex at b = i, and character k on it the triangle at a = k // 2, down
+# for even k and up for odd, so the characters run left to right in the
+# order the triangles do. A filled triangle is any of FILLED. A rectangle
+# of h lines of 2w characters is parallelogramPath(w, h)'s region.
+
+FILLED = '#Xx*1'
+
+# the closed path with a vertex at every unit step along the straight
+# lattice lines from corner to corner
+def polygonPath(corners):
+    path = [tuple(corners[0])]
+    for corner in corners[1:] + corners[:1]:
+        path += polyiamond_library.latticeWalk(path[-1], tuple(corner))
+    return path[:-1]
+
+def hexagonPath(side: int):
+    s = side
+    return polygonPath([(0, 0), (s, 0), (2*s, s), (2*s, 2*s), (s, 2*s), (0, s)])
+
+def trianglePath(side: int):
+    return polygonPath([(0, 0), (side, 0), (side, side)])
+
+def parallelogramPath(width: int, height: int):
+    return polygonPath([(0, 0), (width, 0), (width, height), (0, height)])
+
+# the closed paths along the region's boundary, each edge with the region on
+# its left: counter-clockwise around the outside, clockwise around holes
+def boundaryLoops(tids):
+    out = {}
+    for p, q in polyiamond_library.boundaryEdges(tids):
+        out.setdefault(p, []).append(q)
+
+    loops = []
+    for start in sorted(out):
+        while out[start]:
+            loop = [start]
+            v = out[start].pop()
+            while v != start:
+                loop.append(v)
+                v = out[v].pop()
+            loops.append(loop)
+    return loops
+
+def regionFromTriangles(tids):
+    tids = set(tids)
+    if not tids:
+        raise ValueError("the region has no triangles")
+    return {'perim': polyiamond_library.boundaryPath(tids), 'points': polyiamond.trianglePoints(tids),
+            'triangles': tids, 'boundaries': boundaryLoops(tids)}
+
+# the region inside the closed Eisenstein paths: the outside and its holes,
+# or any paths at all, filled by the even-odd rule
+def regionFromPaths(paths):
+    tids = set()
+    for path in paths:
+        tids ^= polyiamond.pathTriangles([tuple(p) for p in path])
+    return regionFromTriangles(tids)
+
+def maskTriangles(lines):
+    lines = [line.rstrip('\n') for line in lines]
+    tids = set()
+    for b, line in enumerate(reversed(lines)):
+        for k, char in enumerate(line):
+            if char in FILLED:
+                tids.add(polyiamond.makeTriangleId(k // 2, b, k % 2))
+    return tids
+
+def regionFromMask(lines):
+    return regionFromTriangles(maskTriangles(lines))
+
+# the mask of the triangles, moved so the smallest a and b are 0
+def maskText(tids):
+    vertices = [polyiamond.triangleVertex(tid) for tid in tids]
+    min_a, min_b = min(a for a, _ in vertices), min(b for _, b in vertices)
+    bands = {}
+    for (a, b), tid in zip(vertices, tids):
+        bands.setdefault(b - min_b, set()).add(2*(a - min_a) + (tid & 1))
+    lines = []
+    for b in range(max(bands), -1, -1):
+        filled = bands.get(b, ())
+        lines.append(''.join('#' if k in filled else '.' for k in range(max(filled, default=-1) + 1)))
+    return '\n'.join(lines) + '\n'
+
+# A region from a file: JSON with 'paths', a list of closed paths of [a, b]
+# points, or 'mask', a list of lines; anything else is read as a mask.
+def readRegion(fname):
+    with open(fname, 'r') as f:
+        text = f.read()
+    if fname.endswith('.json'):
+        spec = json.loads(text)
+        if 'paths' in spec:
+            return regionFromPaths(spec['paths'])
+        return regionFromMask(spec['mask'])
+    return regionFromMask(text.splitlines())
+
+# the edge connected parts of the triangles, largest first
+def components(tids):
+    left = set(tids)
+    parts = []
+    while left:
+        start = left.pop()
+        part = {start}
+        todo = [start]
+        while todo:
+            for t in polyiamond.triangleNeighbours(todo.pop()):
+                if t in left:
+                    left.remove(t)
+                    part.add(t)
+                    todo.append(t)
+        parts.append(part)
+    return sorted(parts, key=len, reverse=True)
+
+# Check up front that the region can be tiled at all by pieces (paths as in
+# polyiamond.HEXIAMONDS): that it is in one piece, unless connected is
+# False, and that the area of every part is a multiple of the gcd of the
+# piece sizes. Raises ValueError saying what is wrong; returns the area and
+# the numbers of up and down triangles.
+def checkRegion(region, pieces = None, connected = True):
+    tids = region['triangles']
+    if not tids:
+        raise ValueError("the region has no triangles")
+    parts = components(tids)
+    if connected and len(parts) > 1:
+        raise ValueError("the region falls apart into {} parts of {} triangles".format(
+            len(parts), ', '.join(str(len(part)) for part in parts[:10])))
+    if pieces:
+        grain = math.gcd(*(len(polyiamond.pathTriangles(path)) for path in pieces.values()))
+        for part in parts:
+            if len(part) % grain:
+                raise ValueError("{} triangles can't be tiled by pieces of multiples of {}".format(len(part), grain))
+    up = sum(tid & 1 for tid in tids)
+    return {'area': len(tids), 'up': up, 'down': len(tids) - up, 'parts': len(parts)}
+
+if __name__ == '__main__':
+    region = readRegion(sys.argv[1]) if len(sys.argv) > 1 else regionFromPaths([hexagonPath(3)])
+    print(checkRegion(region, polyiamond.HEXIAMONDS, connected=False))
+    sys.stdout.write(maskText(region['triangles']))
@@ -0,0 +1,270 @@
+import os
+import re
+import sys
+import math
+import zlib
+import colorsys
+import hashlib
+import polyiamond
+import exact_cover
+import placement_cache
+import cover_store
+
+# Covers, placements and the grid drawn straight to SVG or PDF, without TeX.
+#
+# Pictures are built as scenes: a width and height in points and a list of
+# drawing operations on closed outlines, each outline a list of ('M', p),
+# ('L', p) and ('C', c1, c2, p) segments with p in points, y going up.
+#   ('piece', outline, fill, stroke, width)  fill the outline and stroke it
+#                                            clipped to itself, so only the
+#                                            inner half of the line shows
+#   ('fill', outline, fill)
+#   ('stroke', outline, stroke, width)
+# Coordinates are make_tikzpictures' (eisToCar, then rotate30 for covers,
+# placements and the grid) in TikZ's default unit of 1cm, and the colours
+# come from preamble-tikz.tex, so the pictures match the TeX ones.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PT_PER_UNIT = 72 / 2.54
+BLACK = (0, 0, 0)
+WHITE = (1, 1, 1)
+
+def readColours(preamble = os.path.join(HERE, 'preamble-tikz.tex')):
+    colours = {}
+    with open(preamble, 'r') as f:
+        for line in f:
+            match = re.search(r'\\definecolor\{(\w+)\}\s*\{RGB\}\{(\d+),(\d+),(\d+)\}', line.split('%')[0])
+            if match:
+                colours[match.group(1)] = tuple(int(v) / 255 for v in match.groups()[1:])
+    return colours
+
+# a piece's colour: its hexiamond's, or one made up from its name for pieces
+# the preamble doesn't know
+def pieceColour(polyname, colours):
+    hname = re.search('[^-]*', polyname).group(0)
+    if hname in colours:
+        return colours[hname]
+    if polyname.endswith('-mirrored'):
+        polyname = polyname[:-len('-mirrored')]
+    hue = int(hashlib.sha256(polyname.encode()).hexdigest()[:8], 16) / 0xffffffff
+    return colorsys.hsv_to_rgb(hue, .65, .9)
+
+# an Eisenstein path as points, dropping repeated vertices
+def pathPoints(eisen_path, rotate = True):
+    points = []
+    for eis in eisen_path:
+        x, y = polyiamond.eisToCar(eis)
+        if rotate:
+            x, y = polyiamond.rotate30((x, y))
+        point = (x * PT_PER_UNIT, y * PT_PER_UNIT)
+        if not points or point != points[-1]:
+            points.append(point)
+    if len(points) > 1 and points[0] == points[-1]:
+        points.pop()
+    return points
+
+# the closed outline through points with every corner rounded off with
+# radius r, like TikZ's rounded corners
+def outline(points, r = 0):
+    if r == 0:
+        return [('M', points[0])] + [('L', p) for p in points[1:]]
+    segments = []
+    n = len(points)
+    for i in range(n):
+        prev, corner, nxt = points[i-1], points[i], points[(i+1) % n]
+        into, out = cornerPoint(corner, prev, r), cornerPoint(corner, nxt, r)
+        segments.append(('M' if i == 0 else 'L', into))
+        # the quadratic through the corner, as a cubic
+        c1 = (into[0] + 2/3*(corner[0]-into[0]), into[1] + 2/3*(corner[1]-into[1]))
+        c2 = (out[0] + 2/3*(corner[0]-out[0]), out[1] + 2/3*(corner[1]-out[1]))
+        segments.append(('C', c1, c2, out))
+    return segments
+
+# the point r along the edge from corner towards p, at most half way
+def cornerPoint(corner, p, r):
+    length = math.dist(corner, p)
+    t = min(r, length/2) / length
+    return (corner[0] + t*(p[0]-corner[0]), corner[1] + t*(p[1]-corner[1]))
+
+# move the scene's operations so everything is at least margin from the
+# origin, and size the scene to fit
+def frame(ops, margin):
+    points = [p for op in ops for segment in op[1] for p in segment[1:]]
+    min_x, min_y = min(x for x, _ in points), min(y for _, y in points)
+    max_x, max_y = max(x for x, _ in points), max(y for _, y in points)
+    ops = translateOps(ops, margin - min_x, margin - min_y)
+    return {'width': max_x - min_x + 2*margin, 'height': max_y - min_y + 2*margin, 'ops': ops}
+
+def translateOps(ops, dx, dy):
+    def move(segment):
+        return (segment[0],) + tuple((x + dx, y + dy) for x, y in segment[1:])
+    return [(op[0], [move(segment) for segment in op[1]]) + op[2:] for op in ops]
+
+# the closed paths around a grid: a region's boundaries (see regions), or
+# makeHexagonishGrid's perimeter
+def gridBoundaries(grid):
+    return grid.get('boundaries', [grid['perim']])
+
+# tikzCover's picture of a cover, a dict of polyname: (path, triangles), in
+# the grid with the given boundaries
+def coverScene(cover, grid_paths, colours, blt = 2.75, wlt = .9, rness = 1):
+    ops = []
+    for polyname, placement in cover.items():
+        ops.append(('piece', outline(pathPoints(placement[0]), rness), pieceColour(polyname, colours), BLACK, blt))
+    for grid_path in grid_paths:
+        ops.append(('stroke', outline(pathPoints(grid_path), rness), BLACK, blt))
+    for polyname, placement in cover.items():
+        ops.append(('stroke', outline(pathPoints(placement[0]), rness), WHITE, wlt))
+    return frame(ops, blt)
+
+# tikzGrid's picture of the grid and its triangles
+def gridOps(grid, lattice = True):
+    ops = [('stroke', outline(pathPoints(path)), BLACK, 3) for path in gridBoundaries(grid)]
+    if lattice:
+        for tri in sorted(grid['triangles']):
+            ops.append(('stroke', outline(pathPoints(polyiamond.triangleCorners(tri))), BLACK, .4))
+    return ops
+
+def gridScene(grid, lattice = True):
+    return frame(gridOps(grid, lattice), 3)
+
+# pdfPlacements' picture of one placement in the grid
+def placementScene(polyname, path, grid, colours):
+    points = pathPoints(path)
+    ops = gridOps(grid)
+    ops.append(('fill', outline(points), pieceColour(polyname, colours)))
+    ops.append(('stroke', outline(points), BLACK, 3))
+    return frame(ops, 3)
+
+# the scenes laid out columns to a row, on one scene (empty if there are none)
+def spriteSheet(scenes, columns = None, gap = 10):
+    scenes = list(scenes)
+    if not scenes:
+        return {'width': 0, 'height': 0, 'ops': []}
+    columns = columns or math.ceil(math.sqrt(len(scenes)))
+    rows = math.ceil(len(scenes) / columns)
+    cell_w = max(scene['width'] for scene in scenes) + gap
+    cell_h = max(scene['height'] for scene in scenes) + gap
+    ops = []
+    for i, scene in enumerate(scenes):
+        row, column = divmod(i, columns)
+        ops += translateOps(scene['ops'], column * cell_w, (rows - 1 - row) * cell_h)
+    return {'width': columns * cell_w - gap, 'height': rows * cell_h - gap, 'ops': ops}
+
+def svgPath(segments, height):
+    def xy(p):
+        return '{:.2f},{:.2f}'.format(p[0], height - p[1])
+    d = []
+    for segment in segments:
+        d.append(segment[0] + ' '.join(xy(p) for p in segment[1:]))
+    return ' '.join(d) + 'Z'
+
+def svgColour(rgb):
+    return '#{:02x}{:02x}{:02x}'.format(*(round(255 * v) for v in rgb))
+
+def svgText(scene):
+    h = scene['height']
+    lines = ['<svg xmlns="http://www.w3.org/2000/svg" width="{w:.2f}pt" height="{h:.2f}pt" '
+             'viewBox="0 0 {w:.2f} {h:.2f}">'.format(w=scene['width'], h=h)]
+    for i, op in enumerate(scene['ops']):
+        d = svgPath(op[1], h)
+        if op[0] == 'piece':
+            lines.append('<clipPath id="c{}"><path d="{}"/></clipPath>'.format(i, d))
+            lines.append('<path d="{}" fill="{}" stroke="{}" stroke-width="{}" clip-path="url(#c{})"/>'.format(
+                d, svgColour(op[2]), svgColour(op[3]), op[4], i))
+        elif op[0] == 'fill':
+            lines.append('<path d="{}" fill="{}"/>'.format(d, svgColour(op[2])))
+        else:
+            lines.append('<path d="{}" fill="none" stroke="{}" stroke-width="{}"/>'.format(
+                d, svgColour(op[2]), op[3]))
+    lines.append('</svg>\n')
+    return '\n'.join(lines)
+
+def writeSVG(scene, fname):
+    with open(fname, 'w') as f:
+        f.write(svgText(scene))
+
+def pdfPath(segments):
+    out = []
+    for segment in segments:
+        coords = ' '.join('{:.2f} {:.2f}'.format(*p) for p in segment[1:])
+        out.append('{} {}'.format(coords, {'M': 'm', 'L': 'l', 'C': 'c'}[segment[0]]))
+    out.append('h')
+    return '\n'.join(out)
+
+def pdfColour(rgb, op):
+    return '{:.3f} {:.3f} {:.3f} {}'.format(*rgb, op)
+
+def pdfContent(scene):
+    out = ['0 J']
+    for op in scene['ops']:
+        path = pdfPath(op[1])
+        if op[0] == 'piece':
+            out += ['q', path, 'W n', pdfColour(op[2], 'rg'), pdfColour(op[3], 'RG'),
+                    '{} w'.format(op[4]), path, 'B', 'Q']
+        elif op[0] == 'fill':
+            out += [pdfColour(op[2], 'rg'), path, 'f']
+        else:
+            out += [pdfColour(op[2], 'RG'), '{} w'.format(op[3]), path, 'S']
+    return '\n'.join(out).encode()
+
+# Write the scenes to fname as a PDF, one page each, as they come: only the
+# page offsets are kept, so a long stream of covers doesn't pile up in
+# memory. Object 1 is the catalog, 2 the page tree and every page is an
+# object followed by its content stream.
+def writePDF(scenes, fname):
+    offsets = {}
+    kids = []
+    with open(fname, 'wb') as f:
+        def obj(num, body):
+            offsets[num] = f.tell()
+            f.write(b'%d 0 obj\n' % num + body + b'\nendobj\n')
+
+        f.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        obj(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+        num = 3
+        for scene in scenes:
+            content = zlib.compress(pdfContent(scene))
+            obj(num, '<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {:.2f} {:.2f}] /Contents {} 0 R >>'.format(
+                scene['width'], scene['height'], num + 1).encode())
+            obj(num + 1, b'<< /Length %d /Filter /FlateDecode >>\nstream\n' % len(content)
+                + content + b'\nendstream')
+            kids.append(num)
+            num += 2
+        obj(2, '<< /Type /Pages /Kids [{}] /Count {} >>'.format(
+            ' '.join('{} 0 R'.format(k) for k in kids), len(kids)).encode())
+
+        xref = f.tell()
+        f.write(b'xref\n0 %d\n0000000000 65535 f \n' % num)
+        for n in range(1, num):
+            f.write(b'%010d 00000 n \n' % offsets[n])
+        f.write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (num, xref))
+    return len(kids)
+
+# Render a stream of covers, as cover_store.iterStore (or, from a .pkl,
+# exact_cover.loadCovers) yields them, to fname: a page per cover for a
+# .pdf, or with columns (always for an .svg) a single sprite sheet with
+# that many covers to a row.
+def renderCovers(covers, fname, columns = None, grid = None, colours = None):
+    grid = grid or placement_cache.cachedHexagonishGrid()
+    colours = colours or readColours()
+    scenes = (coverScene(cover, gridBoundaries(grid), colours) for cover in covers)
+    if columns is None and not fname.endswith('.svg'):
+        return writePDF(scenes, fname)
+    sheet = spriteSheet(scenes, columns)
+    if fname.endswith('.svg'):
+        writeSVG(sheet, fname)
+    else:
+        writePDF([sheet], fname)
+
+if __name__ == '__main__':
+    covers_fname = sys.argv[1] if len(sys.argv) > 1 else 'a-few-covers.hxs'
+    out_fname = sys.argv[2] if len(sys.argv) > 2 else 'pictures/100-covers-preview.pdf'
+    columns = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    if covers_fname.endswith('.pkl'):
+        with open(covers_fname, 'rb') as f:
+            renderCovers(exact_cover.loadCovers(f), out_fname, columns)
+    else:
+        store = cover_store.openStore(covers_fname)
+        renderCovers(cover_store.iterStore(store), out_fname, columns)
+        cover_store.closeStore(store)
@@ -0,0 +1,141 @@
+import sys
+import time
+import polyiamond
+import dancing_links
+import bitmask_cover
+
+# Instrumentation for the exact cover searches, through the visit hook that
+# dancing_links.search and bitmask_cover.search call on entering each node.
+# Without a hook the searches do no extra work at all; with one the cost is
+# a few list updates and a perf_counter() call per node.
+#
+# For every depth d (the number of rows placed) stats keeps
+#   nodes[d]      nodes entered
+#   solutions[d]  covers found
+#   deadEnds[d]   leaves that are not covers
+#   opened[d]     nodes that branched, and branching[d] the sum of their
+#                 candidate counts, so branching[d] / opened[d] is the
+#                 average branching factor at depth d
+#   seconds[d]    time spent at nodes of depth d, from entering one until
+#                 entering the next
+# and columns counts how often each column was chosen to branch on.
+
+def makeStats():
+    return {'nodes': [], 'solutions': [], 'deadEnds': [], 'opened': [], 'branching': [],
+            'seconds': [], 'columns': {}, 'start': time.perf_counter(), 'elapsed': 0.0,
+            'last': None}
+
+def growTo(stats, depth):
+    for key in ('nodes', 'solutions', 'deadEnds', 'opened', 'branching', 'seconds'):
+        values = stats[key]
+        while len(values) <= depth:
+            values.append(0)
+
+# Returns visit(choices, branches) for a search's visit hook. columnOf maps
+# the candidates of a level to the key of the column they cover. Every
+# interval seconds (checked every 1024 nodes) progress(stats) is called.
+def makeVisit(stats, columnOf, progress = None, interval = 10):
+    nodes, opened, branching, seconds, columns = (stats['nodes'], stats['opened'], stats['branching'],
+                                                  stats['seconds'], stats['columns'])
+    state = {'count': 0, 'reported': time.perf_counter()}
+
+    def visit(choices, branches):
+        now = time.perf_counter()
+        depth = len(branches)
+        last = stats['last']
+        if last is not None:
+            last_depth, last_time, solved = last
+            seconds[last_depth] += now - last_time
+            if depth <= last_depth and not solved:
+                stats['deadEnds'][last_depth] += 1
+        if depth >= len(nodes):
+            growTo(stats, depth)
+        nodes[depth] += 1
+        if depth > 0 and branches[-1] == 0:
+            opened[depth-1] += 1
+            branching[depth-1] += len(choices[-1])
+            column = columnOf(choices[-1])
+            columns[column] = columns.get(column, 0) + 1
+        stats['last'] = (depth, now, False)
+
+        state['count'] += 1
+        if progress is not None and state['count'] % 1024 == 0 and now - state['reported'] >= interval:
+            stats['elapsed'] = now - stats['start']
+            progress(stats)
+            state['reported'] = time.perf_counter()
+
+    return visit
+
+# the node the search entered last found a cover
+def markSolution(stats):
+    depth, entered, _ = stats['last']
+    stats['solutions'][depth] += 1
+    stats['last'] = (depth, entered, True)
+
+# account for the last node once the search is over
+def finish(stats):
+    now = time.perf_counter()
+    if stats['last'] is not None:
+        depth, entered, solved = stats['last']
+        stats['seconds'][depth] += now - entered
+        if not solved:
+            stats['deadEnds'][depth] += 1
+        stats['last'] = None
+    stats['elapsed'] = now - stats['start']
+
+# Yield each exact cover as a list of row indices, as exact_cover.searchRows
+# does for 'dlx' and 'bitmask', while filling stats
+def instrumentedSearch(rows, primaryKeys, stats, method = 'dlx', progress = None, interval = 10,
+                       deadline = None):
+    if method == 'dlx':
+        links = dancing_links.makeLinks(rows, primaryKeys)
+        names, C = links['names'], links['C']
+        visit = makeVisit(stats, lambda nodes: names[C[nodes[0]] - 1], progress, interval)
+        found = dancing_links.search(links, deadline, visit=visit)
+    elif method == 'bitmask':
+        matrix = bitmask_cover.makeBitmaskMatrix(rows, primaryKeys)
+        masks, columns = matrix['masks'], matrix['columns']
+        visit = makeVisit(stats, lambda fits: columns[(masks[fits[0]] & -masks[fits[0]]).bit_length() - 1],
+                          progress, interval)
+        found = bitmask_cover.search(matrix, deadline, visit=visit)
+    else:
+        raise ValueError("unknown method {}".format(method))
+
+    stats['start'] = time.perf_counter()
+    try:
+        for cover in found:
+            markSolution(stats)
+            yield cover
+    finally:
+        found.close()
+        finish(stats)
+
+def totals(stats):
+    return {'nodes': sum(stats['nodes']), 'solutions': sum(stats['solutions']),
+            'deadEnds': sum(stats['deadEnds']), 'depth': len(stats['nodes']) - 1,
+            'seconds': stats['elapsed']}
+
+# a progress callback for instrumentedSearch
+def printProgress(stats, file = sys.stderr):
+    t = totals(stats)
+    rate = t['nodes'] / t['seconds'] if t['seconds'] > 0 else 0
+    print('{:.0f}s: {} nodes ({:.0f}/s), {} covers, {} dead ends, depth {}'.format(
+        t['seconds'], t['nodes'], rate, t['solutions'], t['deadEnds'], t['depth']), file=file)
+
+def columnLabel(column):
+    if isinstance(column, int):
+        a, b = polyiamond.triangleVertex(column)
+        return '{} ({}, {})'.format('up' if column & 1 else 'down', a, b)
+    return str(column)
+
+def printStats(stats, file = sys.stdout, top_columns = 10):
+    print('{:>5} {:>12} {:>10} {:>12} {:>10} {:>10}'.format(
+        'depth', 'nodes', 'covers', 'dead ends', 'branching', 'seconds'), file=file)
+    for d in range(len(stats['nodes'])):
+        factor = stats['branching'][d] / stats['opened'][d] if stats['opened'][d] else 0
+        print('{:5} {:12} {:10} {:12} {:10.2f} {:10.3f}'.format(
+            d, stats['nodes'][d], stats['solutions'][d], stats['deadEnds'][d], factor, stats['seconds'][d]), file=file)
+    print(file=file)
+    print('columns chosen most:', file=file)
+    for column, n in sorted(stats['columns'].items(), key=lambda x: -x[1])[:top_columns]:
+        print('{:>20} {:12}'.format(columnLabel(column), n), file=file)
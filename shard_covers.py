@@ -0,0 +1,224 @@
+import os
+import json
+import time
+import socket
+import hashlib
+import argparse
+import dancing_links
+import checkpoint
+
+# Enumeration split into shards that any number of machines sharing a
+# directory can work through, with no service in between.
+#
+# The dancing links search tree is cut off at a fixed depth and each path
+# to that depth, a prefix of rows, is one shard (as in parallel_covers).
+# The manifest lists them. A worker claims a shard by creating its .lock
+# file with O_CREAT | O_EXCL, which only one of them can do, and keeps the
+# lock's mtime fresh while it searches. Covers are written one per line as
+# space separated row indices to a temp file of the worker's own, renamed
+# to the shard's .covers file, and the shard is finished by the .done
+# marker, written last and atomically, with the number of covers and the
+# SHA-256 of the file. A lock whose mtime has gone stale (its worker died)
+# can be stolen by renaming it away first. A worker that finds its lock
+# taken over, on a heartbeat or before renaming its covers into place,
+# drops the shard and leaves it to the new owner.
+#
+# Merging checks that the prefixes still cover the whole tree, that every
+# shard is done and that its file matches its marker, and concatenates the
+# files in manifest order, which is the order dancing_links.search would
+# have found the covers in.
+
+def shardPath(shard_dir, shard_id, extension):
+    return os.path.join(shard_dir, 'shard-{:06d}.{}'.format(shard_id, extension))
+
+def readManifest(shard_dir):
+    return checkpoint.readCheckpoint(os.path.join(shard_dir, 'manifest.json'))
+
+def makeManifest(rows, primaryKeys, shard_dir, depth = 3):
+    os.makedirs(shard_dir, exist_ok=True)
+    prefixes = dancing_links.expandPrefixes(dancing_links.makeLinks(rows, primaryKeys), depth)
+    manifest = {'problem': checkpoint.problemHash(rows, primaryKeys), 'depth': depth,
+                'shards': [{'id': i, 'prefix': prefix} for i, prefix in enumerate(prefixes)]}
+    checkpoint.writeCheckpoint(os.path.join(shard_dir, 'manifest.json'), manifest)
+    return manifest
+
+def fileHash(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+# Claim a shard: True if this worker now holds its lock. A lock untouched
+# for stale seconds is taken over.
+def claimShard(shard_dir, shard_id, owner, stale = 600):
+    lock = shardPath(shard_dir, shard_id, 'lock')
+    for _ in range(2):
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock) < stale:
+                    return False
+                # only one worker's rename of the stale lock succeeds
+                os.rename(lock, '{}.stale-{}'.format(lock, owner))
+            except FileNotFoundError:
+                return False
+            continue
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'owner': owner, 'claimed': time.time()}, f)
+        return True
+    return False
+
+# the owner named in a lock, None if it is gone or not written yet
+def lockOwner(lock):
+    try:
+        with open(lock, 'r') as f:
+            return json.load(f)['owner']
+    except (FileNotFoundError, ValueError):
+        return None
+
+# Search a claimed shard and return its number of covers, or None if the
+# lock was taken over before the shard was done.
+def runShard(links, shard_dir, shard, problem, owner, heartbeat = 30):
+    shard_id, prefix = shard['id'], shard['prefix']
+    lock = shardPath(shard_dir, shard_id, 'lock')
+    covers_path = shardPath(shard_dir, shard_id, 'covers')
+    tmp = '{}.{}.tmp'.format(covers_path, owner)
+    last = time.monotonic()
+    nodes = 0
+    lost = False
+
+    def visit(choices, branches):
+        nonlocal last, nodes, lost
+        nodes += 1
+        if nodes % 1024 == 0 and time.monotonic() - last >= heartbeat:
+            lost = lockOwner(lock) != owner
+            if not lost:
+                os.utime(lock)
+            last = time.monotonic()
+            return lost
+
+    for ridx in prefix:
+        dancing_links.selectRow(links, ridx)
+    count = 0
+    try:
+        with open(tmp, 'w') as out:
+            for cover in dancing_links.search(links, visit=visit):
+                out.write(' '.join(map(str, prefix + cover)) + '\n')
+                count += 1
+            out.flush()
+            os.fsync(out.fileno())
+    finally:
+        for ridx in reversed(prefix):
+            dancing_links.unselectRow(links, ridx)
+
+    if lost or lockOwner(lock) != owner:
+        os.remove(tmp)
+        return None
+    digest = fileHash(tmp)
+    os.replace(tmp, covers_path)
+    checkpoint.writeCheckpoint(shardPath(shard_dir, shard_id, 'done'),
+                               {'problem': problem, 'prefix': prefix, 'count': count, 'sha256': digest})
+    return count
+
+# Work through the manifest's shards until none is left to claim and
+# return the ids of the shards this worker finished.
+def runWorker(rows, primaryKeys, shard_dir, owner = None, stale = 600):
+    manifest = readManifest(shard_dir)
+    problem = checkpoint.problemHash(rows, primaryKeys)
+    if manifest['problem'] != problem:
+        raise ValueError("the manifest in {} is for a different problem".format(shard_dir))
+    owner = owner or '{}-{}'.format(socket.gethostname(), os.getpid())
+    links = dancing_links.makeLinks(rows, primaryKeys)
+    heartbeat = stale / 4
+
+    finished = []
+    for shard in manifest['shards']:
+        if os.path.exists(shardPath(shard_dir, shard['id'], 'done')):
+            continue
+        if not claimShard(shard_dir, shard['id'], owner, stale):
+            continue
+        if runShard(links, shard_dir, shard, problem, owner, heartbeat) is not None:
+            finished.append(shard['id'])
+    return finished
+
+def shardStatus(shard_dir):
+    manifest = readManifest(shard_dir)
+    status = {'shards': len(manifest['shards']), 'done': 0, 'claimed': 0, 'covers': 0}
+    for shard in manifest['shards']:
+        if os.path.exists(shardPath(shard_dir, shard['id'], 'done')):
+            status['done'] += 1
+            status['covers'] += checkpoint.readCheckpoint(shardPath(shard_dir, shard['id'], 'done'))['count']
+        elif os.path.exists(shardPath(shard_dir, shard['id'], 'lock')):
+            status['claimed'] += 1
+    return status
+
+# Check the shards and concatenate their covers into out_path; returns
+# the total number of covers. Raises ValueError naming what is missing or
+# doesn't match.
+def mergeShards(rows, primaryKeys, shard_dir, out_path):
+    manifest = readManifest(shard_dir)
+    problem = checkpoint.problemHash(rows, primaryKeys)
+    if manifest['problem'] != problem:
+        raise ValueError("the manifest in {} is for a different problem".format(shard_dir))
+
+    prefixes = dancing_links.expandPrefixes(dancing_links.makeLinks(rows, primaryKeys), manifest['depth'])
+    if prefixes != [shard['prefix'] for shard in manifest['shards']]:
+        raise ValueError("the manifest's prefixes do not cover the search tree")
+
+    missing = []
+    markers = []
+    for shard in manifest['shards']:
+        done_path = shardPath(shard_dir, shard['id'], 'done')
+        if not os.path.exists(done_path):
+            missing.append(shard['id'])
+            continue
+        done = checkpoint.readCheckpoint(done_path)
+        covers_path = shardPath(shard_dir, shard['id'], 'covers')
+        if (done['problem'] != problem or done['prefix'] != shard['prefix']
+                or not os.path.exists(covers_path) or fileHash(covers_path) != done['sha256']):
+            raise ValueError("shard {} does not match its completion marker".format(shard['id']))
+        markers.append((covers_path, done['count']))
+    if missing:
+        raise ValueError("{} shards are not done: {}".format(len(missing), missing[:20]))
+
+    total = 0
+    tmp = out_path + '.tmp'
+    with open(tmp, 'wb') as out:
+        for covers_path, count in markers:
+            with open(covers_path, 'rb') as f:
+                lines = 0
+                for line in f:
+                    out.write(line)
+                    lines += 1
+            assert lines == count, "{} has {} covers, not {}".format(covers_path, lines, count)
+            total += count
+    os.replace(tmp, out_path)
+    return total
+
+if __name__ == '__main__':
+    import polyiamond
+    import exact_cover
+    import placement_cache
+
+    parser = argparse.ArgumentParser(description='Enumerate every cover in shards over a shared directory.')
+    parser.add_argument('command', choices=['manifest', 'worker', 'status', 'merge'])
+    parser.add_argument('shard_dir')
+    parser.add_argument('--depth', type=int, default=3, help='rows fixed by each shard (manifest)')
+    parser.add_argument('--stale', type=float, default=600, help='seconds before a silent lock is taken over (worker)')
+    parser.add_argument('--output', default='covers.txt', help='merged covers file (merge)')
+    args = parser.parse_args()
+
+    grid = placement_cache.cachedHexagonishGrid()
+    hexi_p = placement_cache.cachedPlacements(grid, polyiamond.HEXIAMONDS)
+    rows, keys = exact_cover.makeProblemMatrix(grid['triangles'], hexi_p)
+
+    if args.command == 'manifest':
+        print('shards:', len(makeManifest(rows, keys, args.shard_dir, args.depth)['shards']))
+    elif args.command == 'worker':
+        print('finished shards:', len(runWorker(rows, keys, args.shard_dir, stale=args.stale)))
+    elif args.command == 'status':
+        print(shardStatus(args.shard_dir))
+    else:
+        print('covers:', mergeShards(rows, keys, args.shard_dir, args.output))
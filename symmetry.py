@@ -0,0 +1,117 @@
+import polyiamond
+import exact_cover
+
+# Symmetry breaking for exact covers of a symmetric region.
+#
+# A symmetry g of the region maps every cover to another cover, renaming
+# pieces to their mirror images when g is a reflection. Fix one piece P and
+# let H be the symmetries that send P's placements to P's placements (all of
+# them when P is achiral, like the hexagon). Every H-orbit of covers has a
+# cover with P at the first placement of its H-orbit of placements, so the
+# search only needs those representatives. Covers that are still equivalent
+# under the stabilizer of that placement are filtered out by keeping the one
+# with the smallest sorted row indices. Each canonical cover then stands for
+# |H| / |Stab(cover)| covers.
+
+def mirrorName(name, names):
+    if name.endswith('-mirrored'):
+        return name[:-len('-mirrored')]
+    if name + '-mirrored' in names:
+        return name + '-mirrored'
+    return name
+
+def rowPiece(row):
+    for key in row:
+        if type(key) is str:
+            return key
+    assert False, "row without a piece"
+
+def rowTriangles(row):
+    return frozenset(key for key in row if type(key) is not str)
+
+# the symmetries of the problem given by rows, as permutations of the row
+# indices (dicts). The identity comes first.
+def rowPermutations(rows):
+    triangles = set()
+    names = set()
+    for row in rows.values():
+        triangles |= rowTriangles(row)
+        names.add(rowPiece(row))
+    lookup = {(rowPiece(row), rowTriangles(row)): ridx for ridx, row in rows.items()}
+    region_min = min(polyiamond.triangleVertex(tid) for tid in triangles)
+
+    perms = []
+    for mirrored in (False, True):
+        for k in range(6):
+            f = polyiamond.latticeSymmetry(k, mirrored)
+            image = {tid: [f(p) for p in polyiamond.triangleCorners(tid)] for tid in triangles}
+            # rotations about the origin only differ from the region's own
+            # symmetries by a lattice translation
+            image_min = min(min(corners) for corners in image.values())
+            da, db = region_min[0]-image_min[0], region_min[1]-image_min[1]
+            tri_map = {tid: polyiamond.triangleId([(a+da, b+db) for a, b in corners]) for tid, corners in image.items()}
+            if set(tri_map.values()) != triangles:
+                continue
+
+            # a symmetry of the region is only a symmetry of the problem if
+            # the piece set has every image, e.g. both chiralities
+            perm = {}
+            for ridx, row in rows.items():
+                name = rowPiece(row)
+                if mirrored:
+                    name = mirrorName(name, names)
+                key = (name, frozenset(tri_map[tri] for tri in rowTriangles(row)))
+                if key not in lookup:
+                    break
+                perm[ridx] = lookup[key]
+            else:
+                perms.append(perm)
+    return perms
+
+def coverKey(cover):
+    return tuple(sorted(cover))
+
+# the subproblem for symmetry breaking on piece: the restricted rows, the
+# symmetries that keep the piece's name and, for each representative
+# placement left in the rows, the symmetries that fix it
+def reduceBySymmetry(rows, piece):
+    perms = [perm for perm in rowPermutations(rows) if all(rowPiece(rows[perm[ridx]]) == piece
+                                                          for ridx, row in rows.items() if rowPiece(row) == piece)]
+
+    stabilizers = {}
+    seen = set()
+    for ridx, row in rows.items():
+        if rowPiece(row) != piece or ridx in seen:
+            continue
+        seen.update(perm[ridx] for perm in perms)
+        stabilizers[ridx] = [perm for perm in perms if perm[ridx] == ridx]
+
+    reduced = {ridx: row for ridx, row in rows.items() if rowPiece(row) != piece or ridx in stabilizers}
+    return reduced, perms, stabilizers
+
+# Yield (cover, multiplicity) for one cover, as row indices, from each class
+# of covers equivalent under the symmetries that keep piece's name. The
+# multiplicity is the size of the class. With expand, every cover in the
+# class is yielded instead, each with multiplicity 1.
+def symmetricSearch(rows, primaryKeys, piece = 'hexagon', method = 'dlx', expand = False):
+    reduced, perms, stabilizers = reduceBySymmetry(rows, piece)
+
+    for cover in exact_cover.searchRows(reduced, primaryKeys, method):
+        placed = [ridx for ridx in cover if ridx in stabilizers][0]
+        key = coverKey(cover)
+        images = [coverKey(perm[ridx] for ridx in cover) for perm in stabilizers[placed]]
+        if min(images) < key:
+            continue
+        if expand:
+            for image in sorted(set(coverKey(perm[ridx] for ridx in cover) for perm in perms)):
+                yield list(image), 1
+        else:
+            yield cover, len(perms) // images.count(key)
+
+def countCovers(rows, primaryKeys, piece = 'hexagon', method = 'dlx'):
+    classes = 0
+    covers = 0
+    for cover, multiplicity in symmetricSearch(rows, primaryKeys, piece, method):
+        classes += 1
+        covers += multiplicity
+    return {'classes': classes, 'covers': covers}
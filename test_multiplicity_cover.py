@@ -0,0 +1,93 @@
+import copy
+import random
+import itertools
+import multiplicity_cover
+
+# Algorithm M checked against brute force over every subset of rows, on
+# small random problems with bounds and coloured secondary keys, and the
+# links checked to come back unchanged however the search ends.
+
+# the covers of rows under bounds, as sorted tuples of row indices
+def bruteCovers(rows, bounds):
+    keys = {key for row in rows.values() for key in row} | set(bounds)
+    covers = set()
+    for m in range(len(rows) + 1):
+        for chosen in itertools.combinations(rows, m):
+            for key in keys:
+                values = [rows[r][key] for r in chosen if key in rows[r]]
+                if key in bounds:
+                    u, v = bounds[key]
+                    if not u <= len(values) <= v:
+                        break
+                elif len(values) > 1 and (1 in values or len(set(values)) > 1):
+                    break
+            else:
+                covers.add(tuple(sorted(chosen)))
+    return covers
+
+def randomProblem(rng):
+    primary = ['p%d' % i for i in range(rng.randint(1, 4))]
+    secondary = ['s%d' % i for i in range(rng.randint(0, 3))]
+    rows = {}
+    for r in range(rng.randint(1, 9)):
+        row = {key: 1 for key in primary if rng.random() < .5}
+        if not row:
+            row[rng.choice(primary)] = 1
+        for key in secondary:
+            if rng.random() < .5:
+                row[key] = rng.choice([1, 'a', 'b'])
+        rows[r] = row
+    bounds = {}
+    for key in primary:
+        v = rng.randint(1, 3)
+        bounds[key] = (rng.randint(0, v), v)
+    return rows, bounds
+
+def problems(count, seed):
+    rng = random.Random(seed)
+    return [randomProblem(rng) for _ in range(count)]
+
+def test_search_matches_brute_force():
+    for rows, bounds in problems(2000, 1):
+        links = multiplicity_cover.makeLinks(rows, bounds)
+        before = copy.deepcopy(links)
+        found = [tuple(sorted(cover)) for cover in multiplicity_cover.search(links)]
+        assert len(found) == len(set(found)), (rows, bounds, found)
+        assert set(found) == bruteCovers(rows, bounds), (rows, bounds, found)
+        assert links == before
+
+def test_links_restored_after_close():
+    for rows, bounds in problems(300, 2):
+        links = multiplicity_cover.makeLinks(rows, bounds)
+        before = copy.deepcopy(links)
+        found = multiplicity_cover.search(links)
+        next(found, None)
+        found.close()
+        assert links == before
+
+def test_links_restored_after_visit_stop():
+    for rows, bounds in problems(300, 3):
+        links = multiplicity_cover.makeLinks(rows, bounds)
+        before = copy.deepcopy(links)
+        for stop_at in range(1, 8):
+            levels = []
+
+            def visit(x):
+                levels.append(len(x))
+                return len(levels) >= stop_at
+
+            list(multiplicity_cover.search(links, visit=visit))
+            assert links == before, (rows, bounds, stop_at)
+
+# the deadline is checked on entering every level; a clock that passes it
+# after a given number of readings stops the search at every depth
+def test_links_restored_after_deadline(monkeypatch):
+    for rows, bounds in problems(300, 4):
+        links = multiplicity_cover.makeLinks(rows, bounds)
+        before = copy.deepcopy(links)
+        for stop_at in range(1, 8):
+            readings = itertools.count(1)
+            monkeypatch.setattr(multiplicity_cover.time, 'monotonic', lambda: next(readings))
+            list(multiplicity_cover.search(links, deadline=stop_at - .5))
+            monkeypatch.undo()
+            assert links == before, (rows, bounds, stop_at)
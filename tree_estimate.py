@@ -0,0 +1,162 @@
+import os
+import sys
+import time
+import math
+import random
+import statistics
+import concurrent.futures
+import dancing_links
+
+# Knuth's estimate of the size of a backtrack tree
+# (https://doi.org/10.1090/S0025-5718-1975-0373371-6) for the dancing links
+# search. A probe walks one random path from the root, choosing columns the
+# way the search does and a uniformly random row at each level. If the
+# levels on the path had d_1, d_2, ... candidates, then
+# 1 + d_1 + d_1 d_2 + ... is an unbiased estimate of the number of nodes and,
+# if the path ends in a cover, d_1 d_2 ... is one of the number of covers
+# (0 if it ends in a dead end). Averaging many probes gives the estimates and
+# their spread gives confidence intervals, though the distribution is heavy
+# tailed and small samples tend to undershoot.
+
+# one probe: estimates of the number of nodes and covers under the links'
+# current state, which is restored afterwards
+def probe(links, rng):
+    R, D, S = links['R'], links['D'], links['S']
+    nodes = weight = 1
+    covers = 0
+    path = []
+    try:
+        while True:
+            if R[0] == 0:
+                covers = weight
+                break
+            c = dancing_links.chooseColumn(links)
+            d = S[c]
+            if d == 0:
+                break
+            weight *= d
+            nodes += weight
+            i = D[c]
+            for _ in range(rng.randrange(d)):
+                i = D[i]
+            dancing_links.cover(links, c)
+            dancing_links.selectNode(links, i)
+            path.append((c, i))
+    finally:
+        for c, i in reversed(path):
+            dancing_links.unselectNode(links, i)
+            dancing_links.uncover(links, c)
+    return nodes, covers
+
+def summarize(values, confidence):
+    mean = statistics.fmean(values)
+    stderr = statistics.stdev(values) / math.sqrt(len(values)) if len(values) > 1 else math.inf
+    z = statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+    return {'mean': mean, 'stderr': stderr, 'low': max(mean - z*stderr, 0), 'high': mean + z*stderr}
+
+_links = None
+
+def _initWorker(rows, primaryKeys):
+    global _links
+    _links = dancing_links.makeLinks(rows, primaryKeys)
+
+def _probes(count, seed):
+    rng = random.Random(seed)
+    return [probe(_links, rng) for _ in range(count)]
+
+# Estimate the number of nodes and covers in the search tree of
+# dancing_links.search from samples probes, with confidence intervals.
+# The probes are split into chunks of chunk_size, each with its own seed
+# drawn from seed, and spread over workers processes (1 for this process),
+# so the result only depends on seed, not on the number of workers.
+def estimate(rows, primaryKeys, samples = 1000, seed = None, workers = 1,
+             confidence = 0.95, chunk_size = 256):
+    rng = random.Random(seed)
+    chunks = []
+    left = samples
+    while left > 0:
+        chunks.append((min(chunk_size, left), rng.getrandbits(64)))
+        left -= chunk_size
+
+    start = time.perf_counter()
+    results = []
+    if workers == 1:
+        _initWorker(rows, primaryKeys)
+        for count, chunk_seed in chunks:
+            results += _probes(count, chunk_seed)
+    else:
+        with concurrent.futures.ProcessPoolExecutor(workers or os.cpu_count(),
+                                                    initializer=_initWorker,
+                                                    initargs=(rows, primaryKeys)) as pool:
+            for found in pool.map(_probes, *zip(*chunks)):
+                results += found
+
+    return {'samples': samples, 'confidence': confidence, 'seconds': time.perf_counter() - start,
+            'nodes': summarize([n for n, _ in results], confidence),
+            'covers': summarize([c for _, c in results], confidence)}
+
+# The share of the search tree that lies to the left of the node at
+# choices/branches, taking every subtree at a level to be equally big
+# (Knuth, TAOCP 7.2.2). It only goes up as the search goes on.
+def fractionDone(choices, branches):
+    done = 0.0
+    share = 1.0
+    for level, branch in zip(choices, branches):
+        share /= len(level)
+        done += branch * share
+    return done
+
+# Returns visit(choices, branches), a visit hook for dancing_links.search
+# (or checkpoint.enumerateWithCheckpoints) that calls
+# progress(eta) every interval seconds (checked every 1024 nodes) with
+#   visited         nodes entered since the hook was made
+#   rate            of them per second
+#   fraction        fractionDone of the current node
+#   remainingNodes  total_nodes (an estimate's nodes mean) times the
+#                   fraction of the tree still ahead
+#   eta             seconds remainingNodes takes at the current rate
+# Since the fraction comes from the position, a resumed search gets a
+# sensible ETA too.
+def makeETA(total_nodes, progress, interval = 10):
+    state = {'visited': 0, 'start': time.perf_counter()}
+    state['reported'] = state['start']
+
+    def visit(choices, branches):
+        state['visited'] += 1
+        if state['visited'] % 1024:
+            return
+        now = time.perf_counter()
+        if now - state['reported'] < interval:
+            return
+        rate = state['visited'] / (now - state['start'])
+        fraction = fractionDone(choices, branches)
+        remaining = total_nodes * (1 - fraction)
+        progress({'visited': state['visited'], 'rate': rate, 'fraction': fraction,
+                  'remainingNodes': remaining, 'eta': remaining / rate})
+        state['reported'] = now
+
+    return visit
+
+def printETA(eta, file = sys.stderr):
+    print('{} nodes at {:.0f}/s, {:.4%} done, about {:.3g} nodes and {:.3g} s to go'.format(
+        eta['visited'], eta['rate'], eta['fraction'], eta['remainingNodes'], eta['eta']), file=file)
+
+def printEstimate(result, file = sys.stdout):
+    print('{} probes in {:.2f} s, {:.0%} confidence intervals'.format(
+        result['samples'], result['seconds'], result['confidence']), file=file)
+    for name in ('nodes', 'covers'):
+        s = result[name]
+        print('{:>6}: {:.4g} (+/- {:.2g}), between {:.4g} and {:.4g}'.format(
+            name, s['mean'], s['stderr'], s['low'], s['high']), file=file)
+
+if __name__ == '__main__':
+    import polyiamond
+    import exact_cover
+    import placement_cache
+
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    grid = placement_cache.cachedHexagonishGrid()
+    hexi_p = placement_cache.cachedPlacements(grid, polyiamond.HEXIAMONDS)
+    rows, keys = exact_cover.makeProblemMatrix(grid['triangles'], hexi_p)
+    printEstimate(estimate(rows, keys, samples, seed=0, workers=workers))
@@ -0,0 +1,227 @@
+import sys
+import random
+import bitmask_cover
+
+# Zero-suppressed decision diagrams for the family of all exact covers,
+# built in the spirit of Knuth's DXZ: the search over the bitmask matrix is
+# memoized on its filled mask, and every state returns the ZDD of the row
+# sets that complete it. Identical subfamilies are shared through the
+# unique table and the union/change results are kept in an operation cache,
+# so the diagram can be far smaller than the list of covers it describes.
+#
+# Node 0 is the empty family, node 1 the family holding only the empty set.
+# Every other node n stands for lo[n] united with {var[n]} joined to each
+# set of hi[n]; variables increase from the root down. Variables are row
+# positions in the bitmask matrix and rowOf translates them back to the row
+# indices of exact_cover.makeProblemMatrix.
+
+EMPTY = 0
+BASE = 1
+
+def makeZDD():
+    inf = float('inf')
+    return {'var': [inf, inf], 'lo': [None, None], 'hi': [None, None],
+            'unique': {}, 'cache': {}, 'counts': {EMPTY: 0, BASE: 1}, 'depth': 0}
+
+def getNode(z, v, lo, hi):
+    if hi == EMPTY:
+        return lo
+    key = (v, lo, hi)
+    node = z['unique'].get(key)
+    if node is None:
+        node = len(z['var'])
+        z['depth'] = max(z['depth'], v + 1)
+        z['var'].append(v)
+        z['lo'].append(lo)
+        z['hi'].append(hi)
+        z['unique'][key] = node
+    return node
+
+# Run op(z, *args), one of the recursive operations below. They recurse once
+# per variable on a path of their arguments, which for union is at most both
+# paths, so the recursion limit is raised to cover twice the variables.
+def deep(z, op, *args):
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, 2*z['depth'] + 1000))
+    try:
+        return op(z, *args)
+    finally:
+        sys.setrecursionlimit(limit)
+
+def union(z, a, b):
+    return deep(z, _union, a, b)
+
+def _union(z, a, b):
+    if a == EMPTY or a == b:
+        return b
+    if b == EMPTY:
+        return a
+    if a > b:
+        a, b = b, a
+    key = ('union', a, b)
+    cache = z['cache']
+    if key in cache:
+        return cache[key]
+    var, lo, hi = z['var'], z['lo'], z['hi']
+    if var[a] < var[b]:
+        node = getNode(z, var[a], _union(z, lo[a], b), hi[a])
+    elif var[a] > var[b]:
+        node = getNode(z, var[b], _union(z, a, lo[b]), hi[b])
+    else:
+        node = getNode(z, var[a], _union(z, lo[a], lo[b]), _union(z, hi[a], hi[b]))
+    cache[key] = node
+    return node
+
+# add v to every set of f; no set of f may already contain v
+def change(z, f, v):
+    return deep(z, _change, f, v)
+
+def _change(z, f, v):
+    if f == EMPTY:
+        return EMPTY
+    var = z['var']
+    if var[f] > v:
+        return getNode(z, v, EMPTY, f)
+    assert var[f] != v, "variable {} is already in the family".format(v)
+    key = ('change', f, v)
+    cache = z['cache']
+    if key in cache:
+        return cache[key]
+    node = getNode(z, var[f], _change(z, z['lo'][f], v), _change(z, z['hi'][f], v))
+    cache[key] = node
+    return node
+
+# the sets of f that contain v
+def onset(z, f, v):
+    return deep(z, _onset, f, v)
+
+def _onset(z, f, v):
+    var = z['var']
+    if f == EMPTY or var[f] > v:
+        return EMPTY
+    if var[f] == v:
+        return getNode(z, v, EMPTY, z['hi'][f])
+    key = ('onset', f, v)
+    cache = z['cache']
+    if key in cache:
+        return cache[key]
+    node = getNode(z, var[f], _onset(z, z['lo'][f], v), _onset(z, z['hi'][f], v))
+    cache[key] = node
+    return node
+
+# the sets of f that do not contain v
+def offset(z, f, v):
+    return deep(z, _offset, f, v)
+
+def _offset(z, f, v):
+    var = z['var']
+    if f == EMPTY or var[f] > v:
+        return f
+    if var[f] == v:
+        return z['lo'][f]
+    key = ('offset', f, v)
+    cache = z['cache']
+    if key in cache:
+        return cache[key]
+    node = getNode(z, var[f], _offset(z, z['lo'][f], v), _offset(z, z['hi'][f], v))
+    cache[key] = node
+    return node
+
+# the number of sets in f, counted bottom up with a stack of its own since
+# paths can be far longer than the recursion limit
+def count(z, f):
+    counts, lo, hi = z['counts'], z['lo'], z['hi']
+    stack = [f]
+    while stack:
+        n = stack[-1]
+        if n in counts:
+            stack.pop()
+        elif lo[n] in counts and hi[n] in counts:
+            counts[n] = counts[lo[n]] + counts[hi[n]]
+            stack.pop()
+        else:
+            stack += (c for c in (lo[n], hi[n]) if c not in counts)
+    return counts[f]
+
+# rows and primaryKeys are as returned by exact_cover.makeProblemMatrix
+def buildCoverZDD(rows, primaryKeys):
+    matrix = bitmask_cover.makeBitmaskMatrix(rows, primaryKeys)
+    masks, candidates, full = matrix['masks'], matrix['candidates'], matrix['full']
+    # number the rows by their lowest column: the rows completing a state
+    # then all come after those that can fill its lowest free column
+    order = [r for rs in candidates for r in rs]
+    var = {r: v for v, r in enumerate(order)}
+    z = makeZDD()
+    states = {}
+
+    # the candidates at a state are distinct variables below every variable
+    # of their completions, so the family is a chain of nodes, one per
+    # candidate that fits, built from the last up
+    def build(used):
+        if used & full == full:
+            return BASE
+        if used in states:
+            return states[used]
+        family = EMPTY
+        for r in reversed(candidates[bitmask_cover.lowestFree(used)]):
+            if not masks[r] & used:
+                family = getNode(z, var[r], family, build(used | masks[r]))
+        states[used] = family
+        return family
+
+    # build recurses once per row of a cover, at most one per primary column
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, len(candidates) + 1000))
+    try:
+        root = build(0)
+    finally:
+        sys.setrecursionlimit(limit)
+
+    rowOf = [matrix['rows'][r] for r in order]
+    return {'zdd': z, 'root': root, 'rowOf': rowOf,
+            'varOf': {ridx: v for v, ridx in enumerate(rowOf)}}
+
+# the covers that use every row in include and none in exclude,
+# given as row indices
+def condition(covers, include = (), exclude = ()):
+    z, f = covers['zdd'], covers['root']
+    for ridx in include:
+        f = onset(z, f, covers['varOf'][ridx])
+    for ridx in exclude:
+        f = offset(z, f, covers['varOf'][ridx])
+    return dict(covers, root=f)
+
+def countCovers(covers):
+    return count(covers['zdd'], covers['root'])
+
+# a uniformly random cover as a list of row indices
+def sampleCover(covers, rng = random):
+    z, f = covers['zdd'], covers['root']
+    if count(z, f) == 0:
+        return None
+    cover = []
+    while f != BASE:
+        hi = z['hi'][f]
+        if rng.randrange(count(z, f)) < count(z, hi):
+            cover.append(covers['rowOf'][z['var'][f]])
+            f = hi
+        else:
+            f = z['lo'][f]
+    return cover
+
+# yield every cover as a list of row indices, walking the diagram
+def iterCovers(covers):
+    z, rowOf = covers['zdd'], covers['rowOf']
+    stack = [(covers['root'], [])]
+    while stack:
+        f, chosen = stack.pop()
+        if f == EMPTY:
+            continue
+        if f == BASE:
+            yield [rowOf[v] for v in chosen]
+            continue
+        stack.append((z['lo'][f], chosen))
+        stack.append((z['hi'][f], chosen + [z['var'][f]]))
+
+def size(covers):
+    return len(covers['zdd']['var'])